@@ -1,16 +1,132 @@
 import streamlit as st
+import pandas as pd
+import heapq
 import os
 from datetime import datetime
+from operator import itemgetter
 from pathlib import Path
-import glob
-from diary_summarization.diary_summary import update_diary_summaries
+from diary_summarization.diary_summary import diary_template_path
+from diary_summarization.fulltext_index import FullTextIndex
+from diary_summarization.habit_metrics import HabitStore
+from diary_summarization.rollup_summaries import update_rollups
+from diary_summarization.semantic_index import SemanticIndex
+from diary_summarization.summary_jobs import JobRunner
+from diary_summarization.vault_manifest import scan_notes
 
-def get_recent_diaries(diary_folder, limit=10):
-    """Get the most recent diary files from the specified folder."""
-    diary_files = glob.glob(os.path.join(diary_folder, "*.md"))
-    # Sort files by modification time, most recent first
-    diary_files.sort(key=os.path.getmtime, reverse=True)
-    return diary_files[:limit]
+PAGE_SIZE = 10
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_diary_snapshot(diary_folder, recursive, folder_mtime_ns):
+    """
+    Stat every note once and return (path, mtime) pairs.
+    folder_mtime_ns only keys the cache: adding, removing or renaming a note
+    changes it, and the ttl picks up notes edited in place.
+    """
+    return [(path, stat.st_mtime) for path, stat in scan_notes(diary_folder, recursive)]
+
+def get_recent_diaries(diary_folder, limit=PAGE_SIZE, offset=0, recursive=False):
+    """
+    Get the most recent diary files from the specified folder.
+    
+    Returns:
+        tuple[list, int]: (path, mtime) pairs of the requested page, most
+            recent first, and the total number of diaries
+    """
+    snapshot = load_diary_snapshot(diary_folder, recursive, os.stat(diary_folder).st_mtime_ns)
+    newest = heapq.nlargest(offset + limit, snapshot, key=itemgetter(1))
+    return newest[offset:], len(snapshot)
+
+STATUS_LABELS = {
+    'queued': "Queued",
+    'cache_hit': "Cache hit",
+    'summarizing': "Summarizing",
+    'written': "Written",
+    'skipped': "Skipped",
+    'failed': "Failed",
+    'deferred': "Deferred",
+}
+
+@st.cache_resource
+def get_job_runner(diary_folder):
+    """One background job runner per vault, shared by every session and rerun."""
+    return JobRunner(diary_folder)
+
+@st.cache_resource
+def get_semantic_index(diary_folder):
+    """Keep the index, and its memory-mapped matrix, open across reruns."""
+    return SemanticIndex.for_vault(diary_folder)
+
+@st.cache_resource
+def get_fulltext_index(diary_folder):
+    """One SQLite-backed index per vault, kept open across reruns."""
+    return FullTextIndex.for_vault(diary_folder)
+
+@st.cache_resource
+def get_habit_store(diary_folder):
+    """Keep the habit columns in memory across reruns; update() only reads edited notes."""
+    return HabitStore(diary_folder)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def refresh_habits(diary_folder, recursive, folder_mtime_ns):
+    """
+    Bring the habit store up to date at most once a minute, instead of
+    stat'ing the whole vault on every rerun. folder_mtime_ns only keys the
+    cache, like in load_diary_snapshot.
+    """
+    get_habit_store(diary_folder).update(recursive)
+    return True
+
+def show_habits(diary_folder, recursive):
+    """Chart numeric frontmatter: rolling averages, streaks and monthly totals."""
+    if st.button("Refresh habits"):
+        refresh_habits.clear()
+    with st.spinner("Reading habits..."):
+        refresh_habits(diary_folder, recursive, os.stat(diary_folder).st_mtime_ns)
+    store = get_habit_store(diary_folder)
+    if not store.keys:
+        st.info("No numeric frontmatter found in the diaries.")
+        return
+    
+    habits = st.multiselect("Habits", store.keys, default=store.keys)
+    window = st.slider("Rolling average window (days)", min_value=1, max_value=90, value=7)
+    if not habits:
+        return
+    
+    st.line_chart(pd.DataFrame({key: store.rolling_mean(key, window) for key in habits},
+                               index=store.dates.astype('datetime64[ns]')))
+    
+    for column, key in zip(st.columns(len(habits)), habits):
+        streak = store.streaks(key)
+        column.metric(f"{key} streak", f"{streak['current']} days", help=f"Longest: {streak['longest']} days")
+    
+    months, _ = store.monthly_totals(habits[0])
+    st.bar_chart(pd.DataFrame({key: store.monthly_totals(key)[1] for key in habits},
+                              index=months.astype(str)))
+
+@st.fragment(run_every=2)
+def show_job_status(runner):
+    """Render the latest summary job; refreshes itself while the job runs."""
+    job = runner.status()
+    if job is None:
+        return
+    
+    files = job['files']
+    finished = sum(job['counts'].get(status, 0) for status in ('written', 'skipped', 'failed'))
+    if job['status'] in ('queued', 'running'):
+        progress = finished / len(files) if files else 0.0
+        st.progress(progress, text=f"Job {job['id']} {job['status']}: {finished}/{len(files)} diaries processed")
+    elif job['status'] == 'done':
+        st.success(job['message'])
+    else:
+        st.error(f"Error updating summaries: {job['message']}")
+    
+    if files:
+        st.dataframe([{
+            'File': os.path.basename(file['path']),
+            'Status': STATUS_LABELS.get(file['status'], file['status']),
+            'Seconds': round(file['seconds'], 2) if file['seconds'] is not None else None,
+            'Error': file['error'] or '',
+        } for file in files], use_container_width=True)
 
 st.title("Obsidian Diary Manager")
 
@@ -23,22 +139,68 @@ if diary_folder:
         st.error("The specified folder does not exist!")
     else:
         # Display recent diaries
-        st.subheader("10 Most Recent Diaries")
-        recent_diaries = get_recent_diaries(diary_folder)
+        st.subheader("Most Recent Diaries")
+        recursive = st.checkbox("Include subfolders", value=False)
+        recent_diaries, total = get_recent_diaries(diary_folder, PAGE_SIZE, 0, recursive)
+        page_count = max(1, -(-total // PAGE_SIZE))
+        if page_count > 1:
+            page = st.number_input(f"Page (of {page_count}, {total} diaries)",
+                                   min_value=1, max_value=page_count, value=1)
+            if page > 1:
+                recent_diaries, total = get_recent_diaries(diary_folder, PAGE_SIZE, (page - 1) * PAGE_SIZE, recursive)
         
         if recent_diaries:
-            for diary in recent_diaries:
-                diary_name = os.path.basename(diary)
-                modified_time = datetime.fromtimestamp(os.path.getmtime(diary))
+            for diary, mtime in recent_diaries:
+                diary_name = os.path.relpath(diary, diary_folder) if recursive else os.path.basename(diary)
+                modified_time = datetime.fromtimestamp(mtime)
                 st.write(f" {diary_name} (Last modified: {modified_time.strftime('%Y-%m-%d %H:%M:%S')})")
         else:
             st.info("No diary files found in the specified folder.")
         
-        # Update summaries button
+        st.subheader("Habits")
+        show_habits(diary_folder, recursive)
+        
+        # Keyword search; the index only re-reads notes changed since the last search
+        keywords = st.text_input("Search diaries:")
+        if keywords:
+            index = get_fulltext_index(diary_folder)
+            try:
+                index.update(diary_folder, diary_template_path, recursive)
+                hits = index.search(keywords, k=PAGE_SIZE)
+                for hit in hits:
+                    st.markdown(f"**{hit['note']}** · {hit['header']} ({hit['score']:.2f}): {hit['snippet']}")
+                if not hits:
+                    st.info("No matching diaries.")
+            except Exception as e:
+                st.error(f"Error searching diaries: {str(e)}")
+        
+        # Search by meaning; the index only re-embeds notes changed since the last search
+        query = st.text_input("Search diaries by meaning:")
+        if query:
+            index = get_semantic_index(diary_folder)
+            try:
+                with st.spinner("Updating search index..."):
+                    index.update(diary_folder, diary_template_path, recursive)
+                for hit in index.search(query, k=PAGE_SIZE):
+                    st.write(f"**{hit['note']}** · {hit['header']} ({hit['score']:.2f}): {hit['preview']}")
+            except Exception as e:
+                st.error(f"Error searching diaries: {str(e)}")
+        
+        # Update summaries in the background, so reruns neither stop nor repeat the work
+        runner = get_job_runner(diary_folder)
+        budget_minutes = st.number_input("Time budget in minutes (0 for none)", min_value=0, value=0,
+                                         help="Most recently edited diaries go first; the rest waits for the next run")
+        bounded = st.checkbox("Bounded generation", value=False,
+                              help="Cap summary length, time out and retry slow requests, pause if Ollama is down")
         if st.button("Update Diary Summaries"):
-            with st.spinner("Updating summaries..."):
-                try:
-                    update_diary_summaries(diary_folder)
-                    st.success("Successfully updated diary summaries!")
-                except Exception as e:
-                    st.error(f"Error updating summaries: {str(e)}")
\ No newline at end of file
+            runner.submit(recursive=recursive, deadline_seconds=budget_minutes * 60 if budget_minutes else None,
+                          bounded=bounded)
+        show_job_status(runner)
+        
+        if st.button("Update Weekly/Monthly Rollups"):
+            with st.spinner("Rolling up daily summaries..."):
+                success, message = update_rollups(diary_folder)
+            if success:
+                st.success(message)
+            else:
+                st.error(message)
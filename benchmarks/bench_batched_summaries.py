@@ -0,0 +1,51 @@
+"""
+Compare one-diary-per-request summaries with batched requests against the
+local fake Ollama server, reporting requests/s and tokens/s.
+
+Run from the repository root:
+    python -m benchmarks.bench_batched_summaries --notes 64 --latency 0.2
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from benchmarks.bench_concurrent_summaries import make_vault
+from benchmarks.fake_ollama import FakeOllamaServer
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notes', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.2, help='fixed seconds per fake model request')
+    parser.add_argument('--prompt-rate', type=float, default=0.0002, help='seconds per prompt token')
+    parser.add_argument('--eval-rate', type=float, default=0.002, help='seconds per generated token')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    with FakeOllamaServer(latency=args.latency, parallel=args.workers,
+                          prompt_rate=args.prompt_rate, eval_rate=args.eval_rate) as server:
+        server.configure_backend()
+        from diary_summarization.diary_summary import summarize_diary_folder
+
+        print(f"{'batch':>6} {'seconds':>8} {'notes/s':>8} {'req':>5} {'req/s':>7} {'tok/s':>8} {'failed':>7}")
+        for batch_size in args.batch_sizes:
+            folder = tempfile.mkdtemp(prefix='bench_vault_')
+            requests_before, tokens_before = server.request_count, server.token_count
+            try:
+                # Distinct notes, so batching is not helped by deduplication
+                make_vault(folder, args.notes, distinct=True)
+                start = time.perf_counter()
+                results = summarize_diary_folder(folder, max_workers=args.workers, batch_size=batch_size)
+                elapsed = time.perf_counter() - start
+            finally:
+                shutil.rmtree(folder)
+            requests = server.request_count - requests_before
+            tokens = server.token_count - tokens_before
+            failed = sum(1 for r in results if r['status'] == 'failed')
+            print(f"{batch_size:>6} {elapsed:>8.2f} {len(results) / elapsed:>8.1f} {requests:>5} "
+                  f"{requests / elapsed:>7.1f} {tokens / elapsed:>8.0f} {failed:>7}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Per-diary latency of default and bounded generation against a fake Ollama
+server that fails, stalls and rambles, and how fast a bounded run pauses
+when the server goes away.
+
+Run from the repository root:
+    python -m benchmarks.bench_bounded_generation --notes 40 --stall-rate 0.1 --error-rate 0.1 --ramble 4
+"""
+
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+from contextlib import nullcontext
+
+from benchmarks.bench_concurrent_summaries import make_vault
+from benchmarks.fake_ollama import FakeOllamaServer
+from benchmarks.run_suite import percentile
+
+SPAN_TEXT = re.compile(r'<span[^>]*>(.*?)</span>', re.DOTALL)
+
+def longest_summary(folder: str) -> int:
+    """Characters of the longest summary written into the vault."""
+    longest = 0
+    for name in os.listdir(folder):
+        if name.endswith('.md'):
+            with open(os.path.join(folder, name), 'r', encoding='utf-8') as f:
+                match = SPAN_TEXT.search(f.read())
+            if match:
+                longest = max(longest, len(match.group(1).strip()))
+    return longest
+
+def run(folder: str, bounded: bool, args) -> tuple[float, list[dict]]:
+    from diary_summarization.bounded_generation import bounded_generation, llm_circuit
+    from diary_summarization.diary_summary import summarize_diary_folder
+    llm_circuit.reset()
+    limits = bounded_generation(request_timeout=args.request_timeout) if bounded else nullcontext()
+    start = time.perf_counter()
+    with limits:
+        results = summarize_diary_folder(folder, max_workers=args.workers)
+    return time.perf_counter() - start, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notes', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.1, help='seconds per fake model request')
+    parser.add_argument('--eval-rate', type=float, default=0.01, help='seconds per generated token')
+    parser.add_argument('--error-rate', type=float, default=0.1, help='share of requests failing with 503')
+    parser.add_argument('--stall-rate', type=float, default=0.1, help='share of requests that hang')
+    parser.add_argument('--stall-seconds', type=float, default=20.0)
+    parser.add_argument('--ramble', type=int, default=4, help='reply length as a multiple of a normal summary')
+    parser.add_argument('--request-timeout', type=float, default=3.0, help='bounded mode timeout per attempt')
+    args = parser.parse_args()
+
+    print(f"{'mode':>8} {'seconds':>8} {'p50 s':>7} {'p99 s':>7} {'max s':>7} {'chars':>6} "
+          f"{'failed':>7} {'deferred':>9}")
+    for bounded in (False, True):
+        with FakeOllamaServer(latency=args.latency, parallel=args.workers, eval_rate=args.eval_rate,
+                              error_rate=args.error_rate, stall_rate=args.stall_rate,
+                              stall_seconds=args.stall_seconds, ramble=args.ramble) as server:
+            server.configure_backend()
+            folder = tempfile.mkdtemp(prefix='bench_vault_')
+            try:
+                make_vault(folder, args.notes, distinct=True)
+                elapsed, results = run(folder, bounded, args)
+                chars = longest_summary(folder)
+            finally:
+                shutil.rmtree(folder)
+        seconds = [r['seconds'] for r in results]
+        counts = {status: sum(1 for r in results if r['status'] == status) for status in ('failed', 'deferred')}
+        print(f"{'bounded' if bounded else 'default':>8} {elapsed:>8.2f} {percentile(seconds, 50):>7.2f} "
+              f"{percentile(seconds, 99):>7.2f} {max(seconds):>7.2f} "
+              f"{chars:>6} {counts['failed']:>7} {counts['deferred']:>9}")
+
+    # The server goes away: a bounded run should pause within a few timeouts
+    server = FakeOllamaServer(latency=args.latency, parallel=args.workers)
+    server.configure_backend()
+    server.httpd.server_close()
+    folder = tempfile.mkdtemp(prefix='bench_vault_')
+    try:
+        make_vault(folder, args.notes, distinct=True)
+        elapsed, results = run(folder, True, args)
+    finally:
+        shutil.rmtree(folder)
+    counts = {status: sum(1 for r in results if r['status'] == status) for status in ('failed', 'deferred')}
+    print(f"server down: bounded run paused after {elapsed:.2f} s, "
+          f"{counts['failed']} failed, {counts['deferred']} deferred")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Throughput of update_diary_summaries at different max_workers settings,
+against the local fake Ollama server.
+
+Run from the repository root:
+    python -m benchmarks.bench_concurrent_summaries --notes 40 --latency 0.1 --parallel 4
+"""
+
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from benchmarks.fake_ollama import FakeOllamaServer
+
+SAMPLE_DIARY = os.path.join(os.path.dirname(__file__), '..', 'diary_summarization', 'diary', 'diary2.md')
+
+def make_vault(folder: str, notes: int, distinct: bool = False):
+    """
+    Copy the sample diary, with its summary emptied, into folder under notes
+    different names. With distinct, every copy gets a line of its own.
+    """
+    with open(SAMPLE_DIARY, 'r', encoding='utf-8') as f:
+        content = re.sub(r'(<span[^>]*>).*?(</span>)', r'\1\n\t\t\n\2', f.read(), flags=re.DOTALL)
+    for i in range(notes):
+        with open(os.path.join(folder, f"2024-01-{i:04d}.md"), 'w', encoding='utf-8') as f:
+            f.write(content + (f"\n第 {i} 天\n" if distinct else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notes', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.1, help='seconds per fake model request')
+    parser.add_argument('--parallel', type=int, default=4, help='requests the fake server serves at once')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with FakeOllamaServer(latency=args.latency, parallel=args.parallel) as server:
+        server.configure_backend()
+        from diary_summarization.diary_summary import summarize_diary_folder
+
+        print(f"{'workers':>8} {'seconds':>8} {'notes/s':>8} {'failed':>7}")
+        for workers in args.workers:
+            folder = tempfile.mkdtemp(prefix='bench_vault_')
+            try:
+                make_vault(folder, args.notes)
+                start = time.perf_counter()
+                results = summarize_diary_folder(folder, max_workers=workers)
+                elapsed = time.perf_counter() - start
+            finally:
+                shutil.rmtree(folder)
+            failed = sum(1 for r in results if r['status'] == 'failed')
+            print(f"{workers:>8} {elapsed:>8.2f} {len(results) / elapsed:>8.1f} {failed:>7}")
+
+if __name__ == '__main__':
+    main()
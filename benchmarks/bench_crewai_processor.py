@@ -0,0 +1,54 @@
+"""
+Wall time, requests and tokens per diary of the crewAI DiaryProcessor, in
+"full" (three agent turns) and "fast" (one turn) mode at different
+max_workers, against the local fake Ollama server. Needs crewai installed.
+
+Run from the repository root:
+    python -m benchmarks.bench_crewai_processor --notes 12 --latency 0.2 --parallel 4
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from benchmarks.bench_concurrent_summaries import make_vault
+from benchmarks.fake_ollama import FakeOllamaServer
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notes', type=int, default=12)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per fake model request')
+    parser.add_argument('--parallel', type=int, default=4, help='requests the fake server serves at once')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--modes', nargs='+', default=['full', 'fast'])
+    args = parser.parse_args()
+
+    from crewai import LLM
+    from diary_summarization.fixed_diary_summarization import DiaryProcessor
+    from diary_summarization.ollama_functions import SUMMARY_MODEL
+
+    with FakeOllamaServer(latency=args.latency, parallel=args.parallel) as server:
+        llm = LLM(model=f"ollama_chat/{SUMMARY_MODEL}", base_url=server.url)
+
+        print(f"{'mode':>5} {'workers':>8} {'seconds':>8} {'s/diary':>8} {'req/diary':>10} {'tok/diary':>10}")
+        for mode in args.modes:
+            for workers in args.workers:
+                folder = tempfile.mkdtemp(prefix='bench_vault_')
+                try:
+                    make_vault(folder, args.notes, distinct=True)
+                    processor = DiaryProcessor(folder, mode=mode, llm=llm, max_workers=workers)
+                    requests_before, tokens_before = server.request_count, server.token_count
+                    start = time.perf_counter()
+                    processed = processor.process_diary_files()
+                    elapsed = time.perf_counter() - start
+                    diaries = max(1, len(processed))
+                    # crewAI's own count when it reports one, else what the server saw
+                    tokens = processor.usage['total_tokens'] or server.token_count - tokens_before
+                    print(f"{mode:>5} {workers:>8} {elapsed:8.2f} {elapsed / diaries:8.3f} "
+                          f"{(server.request_count - requests_before) / diaries:10.1f} {tokens / diaries:10.0f}")
+                finally:
+                    shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
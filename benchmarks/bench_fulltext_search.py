@@ -0,0 +1,57 @@
+"""
+Build time, query latency and incremental update time of the full-text
+index over a synthetic vault.
+
+Run from the repository root:
+    python -m benchmarks.bench_fulltext_search --notes 3000 --queries 50
+"""
+
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.run_suite import percentile
+from benchmarks.synthetic_vault import generate_vault
+from diary_summarization.diary_summary import diary_template_path
+from diary_summarization.fulltext_index import FullTextIndex
+
+QUERIES = ['跑步', '未来的计划', '朋友 聊天', '心情', 'meditation', '今天 身体 轻松', '迷茫']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notes', type=int, default=3000)
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='bench_vault_')
+    try:
+        paths = generate_vault(folder, args.notes)
+        with FullTextIndex.for_vault(folder) as index:
+            start = time.perf_counter()
+            stats = index.update(folder, diary_template_path)
+            build = time.perf_counter() - start
+
+            rng = random.Random(0)
+            timings = []
+            for _ in range(args.queries):
+                query = rng.choice(QUERIES)
+                start = time.perf_counter()
+                index.search(query)
+                timings.append(time.perf_counter() - start)
+
+            with open(paths[0], 'a', encoding='utf-8') as f:
+                f.write("\n# 😊Daily Summary：\n今天学了新的单词\n")
+            start = time.perf_counter()
+            index.update(folder, diary_template_path)
+            update = time.perf_counter() - start
+
+        print(f"notes={args.notes} sections={stats['sections']} build_seconds={build:.2f} "
+              f"update_seconds={update:.3f} query_p50_ms={percentile(timings, 50) * 1000:.1f} "
+              f"query_p99_ms={percentile(timings, 99) * 1000:.1f}")
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Measure cold-start import cost with python -X importtime and enforce a budget.
+
+Each target runs in a fresh interpreter. The report gives the cumulative
+import time of the target's own top-level imports, excluding interpreter
+startup (site), and fails if the budget is exceeded or an LLM framework was
+imported.
+
+Run from the repository root:
+    python -m benchmarks.bench_import_time --budget-ms 200
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Modules that must stay out of the app's first paint and of --list
+LLM_FRAMEWORKS = ('ollama', 'crewai', 'openai', 'litellm', 'langchain', 'langchain_core')
+
+def import_times(args: list[str], cwd: str) -> dict[str, int]:
+    """Run python -X importtime with args and return {module: cumulative microseconds}."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=cwd,
+                            capture_output=True, text=True, env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'})
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented; keep only top-level ones for the total
+        times[name[1:].rstrip()] = int(cumulative)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=200.0)
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    vault = tempfile.mkdtemp(prefix='bench_vault_')
+    shutil.copy(os.path.join(root, 'diary_summarization', 'diary', 'diary1.md'), vault)
+    targets = {
+        # Everything app.py imports from this package before the first paint
+        'app modules': ['-c', 'import diary_summarization.diary_summary, diary_summarization.summary_jobs, '
+                              'diary_summarization.rollup_summaries, diary_summarization.semantic_index, '
+                              'diary_summarization.habit_metrics, diary_summarization.vault_manifest'],
+        'cli --list': ['-m', 'diary_summarization', vault, '--list'],
+        'cli --summarizers': ['-m', 'diary_summarization', '--summarizers'],
+    }
+
+    failed = False
+    try:
+        for label, target in targets.items():
+            times = import_times(target, root)
+            total_ms = sum(us for name, us in times.items() if not name.startswith(' ') and name != 'site') / 1000
+            frameworks = sorted({name.strip() for name in times if name.strip().split('.')[0] in LLM_FRAMEWORKS})
+            over = total_ms > args.budget_ms
+            failed |= over or bool(frameworks)
+            print(f"{label:18} imports_ms={total_ms:7.1f} budget_ms={args.budget_ms:.0f}"
+                  f"{' OVER BUDGET' if over else ''}"
+                  f"{' llm_frameworks=' + ','.join(frameworks) if frameworks else ''}")
+    finally:
+        shutil.rmtree(vault)
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
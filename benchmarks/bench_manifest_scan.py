@@ -0,0 +1,56 @@
+"""
+Time the incremental scan of a large vault with a few edited notes.
+
+Run from the repository root:
+    python -m benchmarks.bench_manifest_scan --notes 10000 --edits 3
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from diary_summarization.vault_manifest import VaultManifest, content_hash
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notes', type=int, default=10000)
+    parser.add_argument('--edits', type=int, default=3)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='bench_vault_')
+    try:
+        paths = []
+        for i in range(args.notes):
+            path = os.path.join(folder, f"note-{i:06d}.md")
+            content = f"# 😊Daily Summary：\nnote {i}\n"
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            paths.append((path, content))
+
+        manifest = VaultManifest.for_vault(folder)
+        for path, content in paths:
+            manifest.record(path, content_hash(content))
+        manifest.save()
+
+        time.sleep(0.01)  # make sure the edits get a newer mtime_ns
+        for path, _ in paths[:args.edits]:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write("edited\n")
+
+        start = time.perf_counter()
+        manifest = VaultManifest.for_vault(folder)
+        changed = manifest.changed_files(folder)
+        for path in changed:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest.record(path, content_hash(f.read()))
+        manifest.save()
+        elapsed = time.perf_counter() - start
+
+        print(f"notes={args.notes} changed={len(changed)} seconds={elapsed:.3f}")
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Compare the single-pass parser with the old regex cascade on large and
+pathological notes.
+
+Run from the repository root:
+    python -m benchmarks.bench_markdown_parser
+"""
+
+import os
+import time
+
+from diary_summarization.markdown_parser import parse_diary
+from diary_summarization.md_helper_functions import (
+    clean_content, extract_header_content, extract_span_content, extract_yaml_frontmatter,
+    get_non_empty_headers_content,
+)
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), '..', 'diary_summarization', 'diary', 'td.md')
+
+def legacy_parse(md_content):
+    """The regex cascade parse_markdown_template used before the single-pass parser."""
+    md_content = clean_content(md_content.replace('\r\n', '\n'))
+    return {
+        'frontmatter': extract_yaml_frontmatter(md_content),
+        'span_data': extract_span_content(md_content),
+        'headers': extract_header_content(md_content),
+    }
+
+def make_notes(template):
+    body = "今天去跑步了，感觉很好 and then I wrote some code. #tag\n"
+    return {
+        'template': template,
+        'large (2k sections)': template + ''.join(f"# Section {i}\n{body * 5}\n---\n" for i in range(2000)),
+        'long section (200k chars)': template + "# 😊Daily Summary：\n" + body * 4000,
+        'many hashes': template + "# 🤩挑战：\n" + ("# " * 5000 + "\n") * 20,
+        'hash soup': template + "# h\n" + "#" * 100000,
+    }
+
+def best_of(func, arg, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    with open(TEMPLATE_PATH, 'r', encoding='utf-8') as f:
+        template = f.read()
+
+    print(f"{'note':<28} {'KiB':>7} {'legacy ms':>10} {'single-pass ms':>15} {'cleaned ms':>11}")
+    for name, note in make_notes(template).items():
+        legacy = best_of(legacy_parse, note)
+        single = best_of(parse_diary, note)
+        cleaned = best_of(lambda n: get_non_empty_headers_content(n, template), note)
+        print(f"{name:<28} {len(note.encode('utf-8')) / 1024:>7.1f} {legacy * 1000:>10.2f} "
+              f"{single * 1000:>15.2f} {cleaned * 1000:>11.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Parse throughput of parse_vault over a nested synthetic vault at different
+worker counts, with the speed-up over one worker and peak memory.
+
+Run from the repository root:
+    python -m benchmarks.bench_parallel_parse --notes 20000 --folders 8 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.run_suite import peak_rss_mb
+from benchmarks.synthetic_vault import generate_vault
+from diary_summarization.diary_summary import diary_template_path
+from diary_summarization.parallel_parse import DEFAULT_CHUNK_SIZE, parse_vault
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notes', type=int, default=20000)
+    parser.add_argument('--folders', type=int, default=8, help='subfolders the notes are spread over')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='bench_vault_')
+    try:
+        per_folder = args.notes // args.folders
+        for i in range(args.folders):
+            generate_vault(os.path.join(folder, f"{2020 + i}", "daily"), per_folder, seed=i)
+
+        print(f"cpus={os.cpu_count()} notes={per_folder * args.folders}")
+        print(f"{'workers':>8} {'seconds':>8} {'notes/s':>9} {'speedup':>8} {'failed':>7} {'rss_mb':>7}")
+        baseline = None
+        for workers in sorted(set(args.workers)):
+            start = time.perf_counter()
+            parsed = failed = 0
+            for note in parse_vault(folder, diary_template_path, workers=workers, chunk_size=args.chunk_size):
+                parsed += 1
+                failed += note.error is not None
+            elapsed = time.perf_counter() - start
+            rate = parsed / elapsed
+            baseline = baseline or rate
+            rss = peak_rss_mb()
+            print(f"{workers:>8} {elapsed:8.2f} {rate:9.0f} {rate / baseline:7.2f}x {failed:>7} "
+                  f"{rss if rss is None else f'{rss:.0f}':>7}")
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Time the summarization pipeline with its LLM replies replayed from a
+cassette, so CPU-side changes are measured without a model or server noise.
+
+Without --cassette, a run against the local fake Ollama server is recorded
+first. To measure against real replies, record a run once with Ollama up:
+
+    OBSIDIAN_AI_LLM_BACKEND=record OBSIDIAN_AI_LLM_CASSETTE=run.jsonl.gz \
+        python -m diary_summarization VAULT
+
+and replay it against an untouched copy of the same vault.
+
+Run from the repository root:
+    python -m benchmarks.bench_replay --notes 64 --repeat 5
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.bench_concurrent_summaries import make_vault
+from benchmarks.fake_ollama import FakeOllamaServer
+
+def summarize_copy(vault: str) -> tuple[float, float, list[dict]]:
+    """Summarize a fresh copy of vault; returns wall seconds, CPU seconds and results."""
+    from diary_summarization.diary_summary import summarize_diary_folder
+    folder = tempfile.mkdtemp(prefix='bench_vault_')
+    try:
+        shutil.copytree(vault, folder, dirs_exist_ok=True)
+        start, cpu_start = time.perf_counter(), time.process_time()
+        results = summarize_diary_folder(folder)
+        return time.perf_counter() - start, time.process_time() - cpu_start, results
+    finally:
+        shutil.rmtree(folder)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notes', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per fake model request when recording')
+    parser.add_argument('--vault', help='vault the cassette was recorded on (with --cassette)')
+    parser.add_argument('--cassette', help='replay this recording instead of recording one')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from diary_summarization.llm_backends import configure_llm_backend
+    from diary_summarization.ollama_functions import SUMMARY_MODEL
+
+    workdir = tempfile.mkdtemp(prefix='bench_replay_')
+    try:
+        vault, cassette = args.vault, args.cassette
+        if cassette is None:
+            vault = os.path.join(workdir, 'vault')
+            os.makedirs(vault)
+            make_vault(vault, args.notes, distinct=True)
+            cassette = os.path.join(workdir, 'run.jsonl.gz')
+            with FakeOllamaServer(latency=args.latency) as server:
+                configure_llm_backend('record', model=SUMMARY_MODEL, cassette=cassette, host=server.url)
+                seconds, _, results = summarize_copy(vault)
+            print(f"recorded {len(results)} notes in {seconds:.2f} s, "
+                  f"cassette {os.path.getsize(cassette) / 1024:.1f} KiB")
+        elif vault is None:
+            parser.error("--cassette needs --vault")
+
+        print(f"{'latency':>8} {'run':>4} {'seconds':>8} {'cpu s':>7} {'failed':>7}")
+        for latency in (1.0, 0.0):
+            configure_llm_backend('replay', model=SUMMARY_MODEL, cassette=cassette, latency=latency)
+            for run in range(args.repeat if latency == 0.0 else 1):
+                seconds, cpu, results = summarize_copy(vault)
+                failed = sum(1 for r in results if r['status'] == 'failed')
+                print(f"{'original' if latency else 'zero':>8} {run + 1:>4} {seconds:>8.3f} {cpu:>7.3f} {failed:>7}")
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
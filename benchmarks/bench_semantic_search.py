@@ -0,0 +1,66 @@
+"""
+Time top-k queries against a large semantic index, and an incremental update.
+
+Random unit vectors stand in for section embeddings, so no embedding model
+is needed; queries use the hashing stand-in projected to the same width.
+
+Run from the repository root:
+    python -m benchmarks.bench_semantic_search --sections 100000 --dim 768 --queries 50
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.run_suite import percentile
+from diary_summarization.semantic_index import SemanticIndex, hashing_embed
+
+SECTIONS_PER_NOTE = 8
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sections', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='bench_index_')
+    try:
+        embed = lambda texts: hashing_embed(texts, args.dim)
+        index = SemanticIndex(f"{folder}/index.npy", f"{folder}/index.sqlite", embed, model='bench')
+        rng = np.random.default_rng(0)
+        start = time.perf_counter()
+        for note in range(args.sections // SECTIONS_PER_NOTE):
+            sections = [(f"header {i}", f"note {note} section {i}") for i in range(SECTIONS_PER_NOTE)]
+            index.add(f"note-{note:06d}.md", sections, rng.standard_normal((SECTIONS_PER_NOTE, args.dim)))
+        index.save()
+        build = time.perf_counter() - start
+        index.close()
+
+        # Reopen, as the app does, so queries read the memory-mapped file
+        index = SemanticIndex(f"{folder}/index.npy", f"{folder}/index.sqlite", embed, model='bench')
+        timings = []
+        for i in range(args.queries):
+            start = time.perf_counter()
+            index.search(f"query {i} 今天 跑步", args.k)
+            timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        sections = [(f"header {i}", f"edited section {i}") for i in range(SECTIONS_PER_NOTE)]
+        index.add("note-000000.md", sections, rng.standard_normal((SECTIONS_PER_NOTE, args.dim)))
+        index.save()
+        update = time.perf_counter() - start
+
+        print(f"sections={index.live_rows} dim={args.dim} build_seconds={build:.2f} "
+              f"update_seconds={update:.3f} query_p50_ms={percentile(timings, 50) * 1000:.1f} "
+              f"query_p99_ms={percentile(timings, 99) * 1000:.1f}")
+        index.close()
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+A local stand-in for the Ollama HTTP API, used by the benchmarks.
+
+Answers /api/chat with a short deterministic summary after a configurable
+delay, so throughput can be measured without a model loaded. Requests with a
+JSON `format` get one summary per "[日记 N]" entry in the prompt, like the
+batched summary prompt asks for.
+
+The delay is latency per request, plus prompt_rate per prompt token and
+eval_rate per generated token.
+
+It speaks HTTP/1.1 keep-alive like Ollama, and counts the connections it
+accepted, so connection reuse by the client shows up in the benchmarks.
+Streamed requests get the reply in NDJSON pieces as it is "generated", and
+stop generating when the client hangs up.
+
+Faults can be injected for testing timeouts and retries: error_rate of the
+requests fail with 503, stall_rate of them hang for stall_seconds, and
+ramble makes every reply that many times longer.
+
+Usage:
+    with FakeOllamaServer(latency=0.2, parallel=4) as server:
+        server.configure_backend()
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_SUMMARY = '今天过得很充实，虽然有些累，但是完成了计划中的事情，心情还不错。'
+STREAM_PIECE_CHARS = 4
+
+def count_tokens(text: str) -> int:
+    """Stand-in tokenizer: one token per CJK character, one per four other characters."""
+    cjk = sum(1 for ch in text if '\u4e00' <= ch <= '\u9fff')
+    return cjk + (len(text) - cjk) // 4 + 1
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connection_count += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        server = self.server
+
+        if self.path == '/api/generate' and not request.get('prompt'):
+            # Empty prompt: the client only asks for the model to be loaded
+            with server.lock:
+                server.warm_up_count += 1
+            self._send_json({'model': request.get('model', 'fake'), 'response': '', 'done': True})
+            return
+        if self.path != '/api/chat':
+            self._send_json({'error': f'unsupported path {self.path}'}, status=404)
+            return
+
+        prompt = request['messages'][-1]['content']
+        if request.get('format'):
+            ids = [int(i) for i in re.findall(r'\[日记 (\d+)\]', prompt)]
+            content = json.dumps({'summaries': [{'id': i, 'summary': FAKE_SUMMARY} for i in ids]},
+                                 ensure_ascii=False)
+        else:
+            content = FAKE_SUMMARY * server.ramble
+        prompt_tokens = count_tokens(prompt)
+
+        with server.lock:
+            server.request_count += 1
+            fault = server.random.random()
+        if fault < server.error_rate:
+            self._send_json({'error': 'server busy'}, status=503)
+            return
+
+        with server.slots:
+            if fault < server.error_rate + server.stall_rate:
+                time.sleep(server.stall_seconds)
+            time.sleep(server.latency + prompt_tokens * server.prompt_rate)
+            if request.get('stream'):
+                content = self._stream_reply(request, content)
+            else:
+                time.sleep(count_tokens(content) * server.eval_rate)
+        eval_tokens = count_tokens(content)
+        with server.lock:
+            server.prompt_tokens += prompt_tokens
+            server.eval_tokens += eval_tokens
+        if request.get('stream'):
+            return
+
+        self._send_json({
+            'model': request.get('model', 'fake'),
+            'created_at': '1970-01-01T00:00:00Z',
+            'message': {'role': 'assistant', 'content': content},
+            'done': True,
+            'done_reason': 'stop',
+            'prompt_eval_count': prompt_tokens,
+            'eval_count': eval_tokens,
+        })
+
+    def _stream_reply(self, request, content: str) -> str:
+        """Send content in NDJSON pieces at eval_rate; returns what was sent before the client hung up."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        pieces = [content[i:i + STREAM_PIECE_CHARS] for i in range(0, len(content), STREAM_PIECE_CHARS)]
+        # The whole reply takes as long as without streaming
+        piece_seconds = count_tokens(content) * self.server.eval_rate / max(1, len(pieces))
+        sent = ''
+        try:
+            for i, piece in enumerate(pieces):
+                time.sleep(piece_seconds)
+                part = {'model': request.get('model', 'fake'), 'message': {'role': 'assistant', 'content': piece},
+                        'done': False}
+                if i == len(pieces) - 1:
+                    part.update(done=True, done_reason='stop', prompt_eval_count=count_tokens(
+                        request['messages'][-1]['content']), eval_count=count_tokens(content))
+                line = (json.dumps(part, ensure_ascii=False) + '\n').encode('utf-8')
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+                sent += piece
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Like Ollama: a client that hangs up cancels the generation
+            with self.server.lock:
+                self.server.cancelled_count += 1
+            self.close_connection = True
+        return sent
+
+class FakeOllamaServer:
+    """Run the stand-in server on a background thread."""
+
+    def __init__(self, latency: float = 0.1, parallel: int = 1, prompt_rate: float = 0.0,
+                 eval_rate: float = 0.0, error_rate: float = 0.0, stall_rate: float = 0.0,
+                 stall_seconds: float = 10.0, ramble: int = 1, seed: int = 0,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.prompt_rate = prompt_rate
+        self.httpd.eval_rate = eval_rate
+        self.httpd.error_rate = error_rate
+        self.httpd.stall_rate = stall_rate
+        self.httpd.stall_seconds = stall_seconds
+        self.httpd.ramble = ramble
+        self.httpd.random = random.Random(seed)
+        # Like OLLAMA_NUM_PARALLEL: requests beyond this wait for a free slot
+        self.httpd.slots = threading.Semaphore(parallel)
+        self.httpd.lock = threading.Lock()
+        self.httpd.request_count = 0
+        self.httpd.prompt_tokens = 0
+        self.httpd.eval_tokens = 0
+        self.httpd.warm_up_count = 0
+        self.httpd.connection_count = 0
+        self.httpd.cancelled_count = 0
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_count(self) -> int:
+        return self.httpd.request_count
+
+    @property
+    def token_count(self) -> int:
+        return self.httpd.prompt_tokens + self.httpd.eval_tokens
+
+    @property
+    def warm_up_count(self) -> int:
+        return self.httpd.warm_up_count
+
+    @property
+    def connection_count(self) -> int:
+        return self.httpd.connection_count
+
+    @property
+    def cancelled_count(self) -> int:
+        return self.httpd.cancelled_count
+
+    def configure_backend(self):
+        """Point the process-wide LLM backend at this server."""
+        from diary_summarization.llm_backends import configure_llm_backend
+        from diary_summarization.ollama_functions import SUMMARY_MODEL
+        configure_llm_backend('ollama', model=SUMMARY_MODEL, host=self.url)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
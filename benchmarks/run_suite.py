@@ -0,0 +1,136 @@
+"""
+Benchmark suite over synthetic vaults.
+
+For every vault size it times the parsing path (parse_markdown_template,
+get_non_empty_headers_content with the template, convert_md_to_string) per
+note, and for the end-to-end sizes runs update_diary_summaries against the
+local fake Ollama server. Results, with throughput, p50/p99 latency and peak
+RSS, are printed and written as JSON for regression tracking.
+
+Run from the repository root:
+    python -m benchmarks.run_suite --sizes 100 1000 10000 100000 --e2e-sizes 100 1000 --output bench.json
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_ollama import FakeOllamaServer
+from benchmarks.synthetic_vault import generate_vault
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, or None where unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def latency_stats(name: str, size: int, latencies: list[float], wall: float) -> dict:
+    return {
+        'benchmark': name,
+        'notes': size,
+        'seconds': round(wall, 4),
+        'notes_per_second': round(size / wall, 2) if wall else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 4),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def bench_parsing(paths: list[str], template_content: str) -> list[dict]:
+    from diary_summarization.md_helper_functions import parse_markdown_template, get_non_empty_headers_content
+    from diary_summarization.ollama_functions import convert_md_to_string
+
+    contents = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            contents.append(f.read())
+
+    stages = {
+        'parse_markdown_template': lambda i: parse_markdown_template(contents[i]),
+        'get_non_empty_headers_content': lambda i: get_non_empty_headers_content(contents[i], template_content),
+        'convert_md_to_string': lambda i: convert_md_to_string(paths[i]),
+    }
+    results = []
+    for name, func in stages.items():
+        latencies = []
+        wall_start = time.perf_counter()
+        for i in range(len(paths)):
+            start = time.perf_counter()
+            func(i)
+            latencies.append(time.perf_counter() - start)
+        results.append(latency_stats(name, len(paths), latencies, time.perf_counter() - wall_start))
+    return results
+
+def bench_end_to_end(folder: str, size: int, workers: int, batch_size: int) -> dict:
+    from diary_summarization.diary_summary import summarize_diary_folder
+
+    start = time.perf_counter()
+    results = summarize_diary_folder(folder, max_workers=workers, batch_size=batch_size)
+    wall = time.perf_counter() - start
+    stats = latency_stats('update_diary_summaries', size, [r['seconds'] for r in results], wall)
+    stats['failed'] = sum(1 for r in results if r['status'] == 'failed')
+    stats['workers'] = workers
+    stats['batch_size'] = batch_size
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--e2e-sizes', type=int, nargs='*', default=[100, 1000])
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds per fake model request')
+    parser.add_argument('--parallel', type=int, default=4, help='requests the fake server serves at once')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'args': vars(args),
+        'results': [],
+    }
+
+    with FakeOllamaServer(latency=args.latency, parallel=args.parallel) as server:
+        server.configure_backend()
+        from diary_summarization.diary_summary import diary_template_path
+
+        with open(diary_template_path, 'r', encoding='utf-8') as f:
+            template_content = f.read()
+
+        for size in sorted(set(args.sizes) | set(args.e2e_sizes)):
+            folder = tempfile.mkdtemp(prefix=f'bench_vault_{size}_')
+            try:
+                paths = generate_vault(folder, size, seed=args.seed)
+                if size in args.sizes:
+                    report['results'] += bench_parsing(paths, template_content)
+                if size in args.e2e_sizes:
+                    report['results'].append(bench_end_to_end(folder, size, args.workers, args.batch_size))
+            finally:
+                shutil.rmtree(folder)
+
+    for result in report['results']:
+        rss = f"{result['peak_rss_mb']:.0f} MB" if result['peak_rss_mb'] is not None else "n/a"
+        print(f"{result['benchmark']:<32} {result['notes']:>7} notes  {result['notes_per_second']:>10} notes/s  "
+              f"p50 {result['p50_ms']:>9} ms  p99 {result['p99_ms']:>9} ms  rss {rss}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Generate synthetic diary vaults shaped like the td.md template.
+
+Notes mix Chinese and English text, and about one in fifty is pathological:
+very long sections, lines full of '#', headers inside code fences, deep
+sub-headings or an unterminated span. Generation is deterministic for a
+given seed.
+"""
+
+import datetime
+import os
+import random
+
+HEADERS = ["✝ praying", "💪 records of self-control：", "😊Daily Summary：", "🤩挑战：", "Day planner"]
+
+CJK_SENTENCES = [
+    "今天去跑步了，感觉身体轻松了很多。",
+    "写代码的时候遇到一个奇怪的 bug，花了很久才解决。",
+    "和朋友聊天，聊到了未来的计划，有点迷茫。",
+    "晚上读了一会儿书，心情平静下来。",
+    "注意力要在呼吸，呼吸轻柔。",
+    "感觉时间过得很快，很多事情还没有做完。",
+]
+
+EN_SENTENCES = [
+    "Spent the morning on the research project.",
+    "Need to review the deep learning notes again.",
+    "Went for a walk after dinner, felt good.",
+    "The meeting took longer than expected.",
+    "Try to sleep before midnight tomorrow.",
+]
+
+def _paragraph(rng: random.Random, sentences: int) -> str:
+    return "".join(
+        rng.choice(CJK_SENTENCES) if rng.random() < 0.6 else rng.choice(EN_SENTENCES) + " "
+        for _ in range(sentences)
+    ).strip()
+
+def _pathological_body(rng: random.Random, kind: int) -> str:
+    if kind == 0:
+        return "\n".join(_paragraph(rng, 20) for _ in range(200))
+    if kind == 1:
+        return ("# " * 2000 + "\n") * 10 + "#" * 20000
+    if kind == 2:
+        return "```\n# not a header\n" + _paragraph(rng, 5) + "\n```\n## sub heading\n### deeper #tag"
+    return "<span class='broken' data-date='2024-01-01'>\n" + _paragraph(rng, 10)
+
+def make_note(rng: random.Random, date: datetime.date, pathological: bool = False) -> str:
+    """Build one note in the td.md layout, filled with random content and an empty summary span."""
+    lines = [
+        "---",
+        "tags:",
+        "  - timeline",
+        f"meditation: {rng.randint(0, 30)}",
+        f"vocab: {rng.randint(0, 50)}",
+        f"joggling: {rng.randint(0, 10)}",
+        f"workSession: {rng.randint(0, 8)}",
+        "---",
+        "<span ",
+        "\t  class='ob-timelines' ",
+        f"\t  data-date=' {date.isoformat()} ' ",
+        "\t  data-title=' 日记' ",
+        "\t  data-class='blue' ",
+        "\t  data-img = 'diary/timeline-image/b.png' ",
+        "\t  data-type='range' ",
+        f"\t  data-end=' {date.isoformat()} '> ",
+        "\t\t",
+        "</span>",
+    ]
+    for header in HEADERS:
+        lines.append(f"# {header}")
+        if header == "💪 records of self-control：":
+            lines += ["注意力要在呼吸，呼吸轻柔", "每天静坐 10 分钟，写个reflection就行了"]
+        elif header == "Day planner":
+            lines += ["need do research, always, it is fun 😍", "- [ ] exercise ", "- [ ] ai code"]
+        if rng.random() < 0.8:
+            lines.append(_paragraph(rng, rng.randint(1, 6)))
+        lines += ["", "---"]
+    if pathological:
+        lines.append(f"# 🤩挑战：{'#' * rng.randint(1, 50)}")
+        lines.append(_pathological_body(rng, rng.randint(0, 3)))
+    return "\n".join(lines) + "\n"
+
+def generate_vault(folder: str, notes: int, seed: int = 0, pathological_ratio: float = 0.02) -> list[str]:
+    """
+    Write notes synthetic diaries into folder, one per day going back from 2025-01-01.
+    
+    Returns:
+        list[str]: Paths of the generated notes
+    """
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    start = datetime.date(2025, 1, 1)
+    paths = []
+    for i in range(notes):
+        date = start - datetime.timedelta(days=i)
+        path = os.path.join(folder, f"{date.isoformat()}-{i}.md")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(make_note(rng, date, rng.random() < pathological_ratio))
+        paths.append(path)
+    return paths
@@ -0,0 +1,84 @@
+"""
+Command line entry point.
+
+    python -m diary_summarization FOLDER --list      # notes and whether they still need a summary
+    python -m diary_summarization FOLDER             # update summaries with the ollama backend
+    python -m diary_summarization FOLDER --summarizer crewai
+    python -m diary_summarization FOLDER --watch     # summarize notes as they are saved
+    python -m diary_summarization FOLDER --bounded --deadline 5   # predictable run time
+    python -m diary_summarization --summarizers      # registered backends
+
+--list and --summarizers only stat and read notes; no LLM library is imported.
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from diary_summarization.note_status import needs_summary
+from diary_summarization.summarizers import list_summarizers, load_summarizer
+from diary_summarization.vault_manifest import scan_notes
+
+def list_notes(diary_folder: str, recursive: bool = False):
+    """Print every note, newest first, with its summary status."""
+    notes = sorted(scan_notes(diary_folder, recursive), key=lambda note: note[1].st_mtime, reverse=True)
+    for path, stat in notes:
+        with open(path, 'r', encoding='utf-8') as f:
+            status = "pending" if needs_summary(f.read()) else "done"
+        modified = datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"{status:8} {modified}  {os.path.relpath(path, diary_folder)}")
+    print(f"{len(notes)} notes")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m diary_summarization", description="Summarize Obsidian diary notes.")
+    parser.add_argument('diary_folder', nargs='?')
+    parser.add_argument('--list', action='store_true', help="list notes and their summary status")
+    parser.add_argument('--recursive', action='store_true', help="include notes in subfolders when listing")
+    parser.add_argument('--summarizers', action='store_true', help="list summarizer backends")
+    parser.add_argument('--summarizer', default='ollama', help="backend used to summarize (default: ollama)")
+    parser.add_argument('--deadline', type=float, help="minutes after which no new note is started (ollama)")
+    parser.add_argument('--token-budget', type=int, help="LLM tokens after which no new note is started (ollama)")
+    parser.add_argument('--bounded', action='store_true',
+                        help="stream and cap summaries, time out and retry requests, pause if the server is down (ollama)")
+    parser.add_argument('--watch', action='store_true', help="keep running and summarize notes once they are saved")
+    parser.add_argument('--debounce', type=float, default=2.0, help="seconds a note must be unchanged before --watch summarizes it")
+    args = parser.parse_args(argv)
+
+    if args.summarizers:
+        for backend in list_summarizers():
+            print(f"{backend['name']:8} {backend['description']}")
+        return 0
+    if not args.diary_folder:
+        parser.error("diary_folder is required")
+    ollama_only = [flag for flag, value in (('--deadline', args.deadline), ('--token-budget', args.token_budget),
+                                            ('--bounded', args.bounded or None)) if value is not None]
+    if ollama_only and args.summarizer != 'ollama':
+        parser.error(f"--summarizer {args.summarizer} does not take {', '.join(ollama_only)}; "
+                     "they only apply to ollama")
+    if not os.path.isdir(args.diary_folder):
+        print(f"Diary folder does not exist: {args.diary_folder}")
+        return 1
+    if args.list:
+        list_notes(args.diary_folder, args.recursive)
+        return 0
+    if args.watch:
+        from diary_summarization.vault_watcher import VaultWatcher
+        print(f"Watching {args.diary_folder}, press Ctrl+C to stop")
+        options = {'bounded': True} if args.bounded else {}
+        VaultWatcher(args.diary_folder, debounce=args.debounce, **options).run_forever()
+        return 0
+
+    options = {}
+    if args.deadline is not None:
+        options['deadline_seconds'] = args.deadline * 60
+    if args.token_budget is not None:
+        options['token_budget'] = args.token_budget
+    if args.bounded:
+        options['bounded'] = True
+    success, message = load_summarizer(args.summarizer)(args.diary_folder, **options)
+    print(message)
+    return 0 if success else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
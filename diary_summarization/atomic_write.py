@@ -0,0 +1,72 @@
+"""
+Crash-safe file writes.
+
+A note is written to a hidden temp file next to it, fsynced and renamed over
+the original, so an interrupted run leaves either the old or the new note,
+never a truncated one. The rename only becomes durable once the folder is
+fsynced too; DirectorySync collects folders so a bulk run syncs each one
+once instead of once per note.
+"""
+
+import os
+import stat
+import tempfile
+
+def fsync_directory(folder: str):
+    """fsync a folder so renames inside it survive a crash. No-op where folders can't be opened (Windows)."""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class DirectorySync:
+    """Folders with pending renames, synced together by flush()."""
+
+    def __init__(self):
+        self.folders = set()
+
+    def add(self, path: str):
+        self.folders.add(os.path.dirname(os.path.abspath(path)))
+
+    def flush(self):
+        for folder in self.folders:
+            fsync_directory(folder)
+        self.folders.clear()
+
+def atomic_write_text(path: str, content: str, dir_sync: DirectorySync = None):
+    """
+    Replace path with content atomically, keeping the file's permissions.
+    
+    Args:
+        path (str): File to write
+        content (str): New text content, written as UTF-8
+        dir_sync (DirectorySync): Collects the folder for a later fsync; without
+            it the folder is fsynced right away
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    # Hidden and not ending in .md, so vault scans never pick it up
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    
+    if dir_sync is not None:
+        dir_sync.add(path)
+    else:
+        fsync_directory(folder)
@@ -0,0 +1,256 @@
+"""
+Latency-bounded summary requests.
+
+Inside a bounded_generation block every request made through ollama_chat
+streams its reply. Summaries stop being read once they reach max_chars
+(the server is also told to stop generating at a matching token cap), so a
+rambling model cannot run on. Each attempt has a timeout, cut to what is
+left of the run's deadline, and transient failures (timeouts, connection
+errors, 429 and 5xx) are retried with jittered exponential backoff.
+
+The limits belong to the run that set them: they are kept in a context
+variable, which worker threads see when their work is wrapped with
+run_in_context, so bounded and unbounded runs can overlap in one process.
+
+Consecutive transient failures open a process-wide circuit breaker. While
+it is open, requests fail at once with GenerationPaused and the run stops
+starting notes, leaving them 'deferred' for the next run; after a cool-down
+one request probes the server again.
+
+A diary's requests thus take at most about (retries + 1) timeouts plus the
+backoff, and stop at the run's deadline. A server that stalls mid-reply can
+hold an attempt for up to twice its timeout, since the timeout applies to
+each read and the elapsed time is checked between pieces.
+"""
+
+import contextvars
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from diary_summarization.metrics import pipeline_metrics
+
+# Summaries are asked for in 50-100 characters; the stream is cut a little past that
+SUMMARY_MAX_CHARS = 120
+DEFAULT_REQUEST_TIMEOUT = 30.0
+DEFAULT_RETRIES = 2
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+BREAKER_FAILURES = 3
+BREAKER_COOLDOWN = 30.0
+
+# Timeouts, rate limiting and server errors are worth another attempt
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+SENTENCE_END = re.compile(r'[。！？!?.]')
+
+class GenerationPaused(Exception):
+    """A request was not made or not finished because the server looks down or the run's deadline passed."""
+
+class CircuitBreaker:
+    """Stops requests after several transient failures in a row, then lets one probe through per cool-down."""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        """
+        Args:
+            failures (int): Consecutive transient failures that open the breaker
+            cooldown (float): Seconds before an open breaker lets a probe request through
+        """
+        self.failures = failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at = None
+        self._probing = False
+
+    def is_open(self) -> bool:
+        """Whether requests are being refused right now."""
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.cooldown
+
+    def allow(self) -> bool:
+        """Whether a request may go out; after the cool-down only one probe at a time."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._probing or self._consecutive >= self.failures:
+                if self._opened_at is None:
+                    pipeline_metrics.increment('llm_circuit_opened_total')
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def reset(self):
+        self.record_success()
+
+llm_circuit = CircuitBreaker()
+
+class GenerationLimits:
+    """Timeouts and retries of the requests made in one bounded run."""
+
+    def __init__(self, request_timeout: float = DEFAULT_REQUEST_TIMEOUT, retries: int = DEFAULT_RETRIES,
+                 run_seconds: float = None):
+        """
+        Args:
+            request_timeout (float): Seconds one attempt may take
+            retries (int): Further attempts after a transient failure
+            run_seconds (float): Seconds from now after which no request is made or finished
+        """
+        self.request_timeout = request_timeout
+        self.retries = retries
+        self.deadline = time.monotonic() + run_seconds if run_seconds is not None else None
+
+    def seconds_left(self) -> float:
+        """Seconds until the run's deadline, or None without one."""
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+_limits = contextvars.ContextVar('generation_limits', default=None)
+
+def get_generation_limits() -> GenerationLimits:
+    """The limits of the bounded_generation block being run, or None outside one."""
+    return _limits.get()
+
+@contextmanager
+def bounded_generation(**limits):
+    """
+    Apply GenerationLimits to every ollama_chat request made in the block,
+    and in worker threads running functions wrapped with run_in_context.
+    Other threads, and so other runs, are not affected.
+
+    Args:
+        **limits: GenerationLimits arguments, e.g. run_seconds
+    """
+    token = _limits.set(GenerationLimits(**limits))
+    try:
+        yield _limits.get()
+    finally:
+        _limits.reset(token)
+
+def run_in_context(fn):
+    """
+    Wrap fn to run in a copy of the calling thread's context, so work handed
+    to a thread pool keeps the run's limits.
+    """
+    context = contextvars.copy_context()
+    # One copy per call: a context cannot be entered by two threads at once
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+def generation_paused() -> bool:
+    """Whether a bounded run should stop starting notes because the server looks down."""
+    return _limits.get() is not None and llm_circuit.is_open()
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed request is worth retrying."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if status is not None:
+        return status in TRANSIENT_STATUS_CODES
+    # httpx's timeouts and connection errors, without importing httpx
+    return type(error).__module__.split('.')[0] == 'httpx'
+
+def reply_token_cap(max_chars: int) -> int:
+    """num_predict for a reply of max_chars characters; generous, since a CJK character is about a token."""
+    return max_chars * 4 // 3
+
+def trim_reply(text: str, max_chars: int) -> str:
+    """Cut a reply to max_chars, at the last sentence end if that keeps at least half of it."""
+    text = text[:max_chars]
+    ends = [match.end() for match in SENTENCE_END.finditer(text)]
+    if ends and ends[-1] >= max_chars // 2:
+        return text[:ends[-1]]
+    return text.rstrip() + "…"
+
+def _stream_reply(backend, prompt, timeout: float, max_chars: int = None, **request) -> dict:
+    start = time.monotonic()
+    response = {}
+    pieces = []
+    length = 0
+    stream = backend.stream(prompt, timeout=timeout, **request)
+    try:
+        for chunk in stream:
+            response.update(chunk)
+            pieces.append(chunk['content'])
+            length += len(chunk['content'])
+            if max_chars and length >= max_chars:
+                pipeline_metrics.increment('llm_replies_cut_total')
+                break
+            if time.monotonic() - start > timeout:
+                raise TimeoutError(f"No complete reply within {timeout:.0f} s")
+    finally:
+        # Dropping the request makes the server stop generating
+        stream.close()
+    content = "".join(pieces)
+    response['content'] = trim_reply(content, max_chars) if max_chars and length >= max_chars else content
+    return response
+
+def bounded_chat(backend, prompt, limits: GenerationLimits, format=None, options: dict = None,
+                 num_predict: int = None, max_chars: int = None) -> dict:
+    """
+    Send one prompt with streaming, timeouts, retries and the circuit breaker.
+
+    Args:
+        backend (LLMBackend): Backend to send it to
+        prompt (str): The user message
+        limits (GenerationLimits): Timeouts and retries of the run
+        format: As for LLMBackend.chat
+        options (dict): As for LLMBackend.chat
+        num_predict (int): Cap on generated tokens when max_chars is not given
+        max_chars (int): Stop reading the reply at this many characters
+
+    Returns:
+        dict: As LLMBackend.chat
+
+    Raises:
+        GenerationPaused: The breaker is open or the run's deadline passed
+    """
+    if max_chars:
+        num_predict = reply_token_cap(max_chars)
+    last_error = None
+    for attempt in range(limits.retries + 1):
+        if attempt:
+            # Full jitter, so workers that failed together do not retry together
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            left = limits.seconds_left()
+            if left is not None and delay >= left:
+                raise GenerationPaused("The run's deadline passed") from last_error
+            time.sleep(delay)
+        timeout = limits.request_timeout
+        left = limits.seconds_left()
+        if left is not None:
+            if left <= 0:
+                raise GenerationPaused("The run's deadline passed") from last_error
+            timeout = min(timeout, left)
+        if not llm_circuit.allow():
+            raise GenerationPaused("The LLM server is not responding") from last_error
+        try:
+            response = _stream_reply(backend, prompt, timeout, max_chars, format=format, options=options,
+                                     num_predict=num_predict)
+        except Exception as e:
+            if not is_transient(e):
+                # The server answered, it just refused this request
+                llm_circuit.record_success()
+                raise
+            llm_circuit.record_failure()
+            pipeline_metrics.increment('llm_transient_errors_total')
+            last_error = e
+            continue
+        llm_circuit.record_success()
+        return response
+    if llm_circuit.is_open():
+        raise GenerationPaused("The LLM server is not responding") from last_error
+    raise last_error
@@ -0,0 +1,132 @@
+"""
+Map-reduce summaries for long diaries.
+
+A diary whose cleaned text is too long for one prompt is summarized from its
+(header, content) sections, one chunk per section; a section over the token
+budget is split further along date-stamped entries, then sentences, and its
+pieces packed into chunks of their own. A chunk never spans two sections, so editing one section leaves
+every other chunk, and its cached summary, as it was. The chunks are
+summarized concurrently and the chunk summaries merged into the final
+summary; chunk and merge results go into the summary cache.
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from diary_summarization.bounded_generation import run_in_context
+from diary_summarization.ollama_functions import (
+    estimate_tokens, qwen2_partial_summary, qwen2_reduce_summary, summary_cache_options, summary_model_id,
+)
+from diary_summarization.summary_cache import SummaryCache, make_cache_key
+
+# Texts above this many estimated tokens are summarized in chunks
+CHUNK_TOKEN_BUDGET = 1500
+CHUNK_MAX_WORKERS = 4
+CHUNK_PROMPT_VERSION = 1
+
+ENTRY_START = re.compile(r'\s+(?=\d{4}-\d{2}-\d{2})')
+SENTENCE_END = re.compile(r'(?<=[。！？!?.])\s*')
+
+def _split_to_budget(text: str, budget: int, splitters: list) -> list[str]:
+    """Split text at the first kind of boundary that helps, down to a hard cut."""
+    if estimate_tokens(text) <= budget:
+        return [text]
+    if not splitters:
+        # One CJK character is about one token, so budget characters always fit
+        return [text[i:i + budget] for i in range(0, len(text), budget)]
+    
+    parts = [part for part in splitters[0].split(text) if part.strip()]
+    if len(parts) <= 1:
+        return _split_to_budget(text, budget, splitters[1:])
+    pieces = []
+    for part in parts:
+        pieces += _split_to_budget(part, budget, splitters[1:])
+    return pieces
+
+def split_into_chunks(sections: list[tuple[str, str]], token_budget: int = CHUNK_TOKEN_BUDGET) -> list[str]:
+    """
+    Turn a diary's sections into one chunk per section, splitting sections
+    over token_budget tokens into several. Every chunk starts with its
+    section's "header: ".
+    
+    Args:
+        sections (list[tuple[str, str]]): Output of get_non_empty_sections
+        token_budget (int): Approximate token budget per chunk
+        
+    Returns:
+        list[str]: Chunks in their original order
+    """
+    chunks = []
+    for header, body in sections:
+        if not body.strip():
+            continue
+        prefix = f"{header}: " if header else ''
+        budget = max(1, token_budget - estimate_tokens(prefix))
+        
+        # Pack the section's own pieces, so its chunk boundaries depend on nothing else
+        current, current_tokens = [], 0
+        for piece in _split_to_budget(body, budget, [ENTRY_START, SENTENCE_END]):
+            piece = piece.strip()
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > budget:
+                chunks.append(prefix + ' '.join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+        if current:
+            chunks.append(prefix + ' '.join(current))
+    return chunks
+
+def _cached(cache: SummaryCache, stage: str, text: str, summarize) -> str:
+    if cache is None:
+        return summarize()
+    key = make_cache_key(text, summary_model_id(), f"{stage}-{CHUNK_PROMPT_VERSION}", summary_cache_options())
+    summary = cache.get(key)
+    if summary is None:
+        summary = summarize()
+        cache.put(key, summary)
+    return summary
+
+def summarize_long_text(sections: list[tuple[str, str]], cache: SummaryCache = None,
+                        token_budget: int = CHUNK_TOKEN_BUDGET, max_workers: int = CHUNK_MAX_WORKERS) -> str:
+    """
+    Summarize a long diary by map-reduce over its sections.
+    
+    Args:
+        sections (list[tuple[str, str]]): Output of get_non_empty_sections
+        cache (SummaryCache): Cache for chunk and merge results, if any
+        token_budget (int): Approximate token budget per chunk and per merge
+        max_workers (int): Maximum number of chunks summarized at once; inside
+            a request_slots block the run's cap applies as well
+        
+    Returns:
+        str: Summary of the whole text
+    """
+    chunks = split_into_chunks(sections, token_budget)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        summaries = list(executor.map(
+            run_in_context(lambda chunk: _cached(cache, 'chunk', chunk, lambda: qwen2_partial_summary(chunk))), chunks
+        ))
+    
+    # Merge in groups that fit the budget until one summary is left
+    while True:
+        groups = []
+        current, current_tokens = [], 0
+        for summary in summaries:
+            tokens = estimate_tokens(summary)
+            if current and current_tokens + tokens > token_budget:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(summary)
+            current_tokens += tokens
+        groups.append(current)
+        if len(groups) == len(summaries) > 1:
+            # Summaries too long to pair up: merge them all in one request
+            groups = [summaries]
+        
+        summaries = [
+            _cached(cache, 'reduce', "\n".join(group), lambda group=group: qwen2_reduce_summary(group))
+            for group in groups
+        ]
+        if len(summaries) == 1:
+            return summaries[0]
@@ -0,0 +1,63 @@
+"""
+Diary template compiled once per run.
+
+The template's predefined text is turned into a set of boilerplate lines per
+header, so removing it from a diary is a single pass over the diary's lines
+instead of re-parsing the template for every note.
+"""
+
+import os
+import threading
+
+from diary_summarization.markdown_parser import DiaryDocument, parse_diary
+
+class CompiledTemplate:
+    """Per-header sets of the template's predefined lines."""
+
+    def __init__(self, template_content: str):
+        doc = parse_diary(template_content)
+        self.boilerplate = {}
+        for section in doc.sections:
+            lines = frozenset(line.strip() for line in section.content.split('\n') if line.strip())
+            if lines:
+                self.boilerplate[section.title] = lines
+
+    @classmethod
+    def from_file(cls, template_path: str) -> "CompiledTemplate":
+        with open(template_path, 'r', encoding='utf-8') as f:
+            return cls(f.read())
+
+    def strip(self, doc: DiaryDocument) -> list:
+        """
+        Return (header, content) pairs of a parsed diary with every line that
+        also appears under the same header in the template removed.
+        """
+        pairs = []
+        for section in doc.sections:
+            boilerplate = self.boilerplate.get(section.title)
+            content = section.content
+            if boilerplate:
+                content = '\n'.join(
+                    line for line in content.split('\n') if line.strip() not in boilerplate
+                ).strip()
+            pairs.append((section.title, content))
+        return pairs
+
+_compiled_templates = {}
+_compiled_templates_lock = threading.Lock()
+
+def load_template(template_path: str) -> CompiledTemplate:
+    """
+    Return the compiled template for template_path, compiling it again only
+    when the file's mtime changed since it was last loaded.
+    """
+    mtime_ns = os.stat(template_path).st_mtime_ns
+    key = os.path.abspath(template_path)
+    with _compiled_templates_lock:
+        cached = _compiled_templates.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+    template = CompiledTemplate.from_file(template_path)
+    with _compiled_templates_lock:
+        _compiled_templates[key] = (mtime_ns, template)
+    return template
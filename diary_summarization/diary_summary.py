@@ -1,138 +1,727 @@
-from diary_summarization.ollama_functions import qwen2_summary
-from diary_summarization.md_helper_functions import get_non_empty_headers_content
-from dotenv import load_dotenv
+from diary_summarization.ollama_functions import (
+    qwen2_summary, qwen2_batch_summary, pack_batches, estimate_tokens,
+    request_slots, summary_model_id, summary_cache_options, warm_up_summary_model, SUMMARY_PROMPT_VERSION,
+    DEFAULT_BATCH_TOKEN_BUDGET,
+)
+from diary_summarization.summary_cache import SummaryCache, make_cache_key
+from diary_summarization.chunked_summary import CHUNK_TOKEN_BUDGET, summarize_long_text
+from diary_summarization.vault_manifest import VaultManifest, content_hash, scan_notes
+from diary_summarization.md_helper_functions import format_sections, get_non_empty_headers_content, get_non_empty_sections
+from diary_summarization.note_status import EMPTY_SPAN_PATTERN, has_empty_span, has_summary
+from diary_summarization.parallel_parse import ParsedNote, parse_vault
+from diary_summarization.compiled_template import load_template
+from diary_summarization.atomic_write import DirectorySync, atomic_write_text
+from diary_summarization.file_lock import NoteLock
+from diary_summarization.run_schedule import RunBudget, format_remaining, prioritize_diary_files
+from diary_summarization.bounded_generation import (
+    GenerationPaused, bounded_generation, generation_paused, llm_circuit, run_in_context,
+)
+from diary_summarization.metrics import pipeline_metrics
+from diary_summarization.vault_state import state_path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import nullcontext
+import os
+import queue
 import re
+import threading
+import time
 
-diary_template_path = r"diary_summarization\diary\td.md"
+diary_template_path = os.path.join(os.path.dirname(__file__), "diary", "td.md")
+
+# Number of diaries summarized at the same time. Ollama only serves requests
+# in parallel when OLLAMA_NUM_PARALLEL > 1, otherwise extra workers just queue.
+DEFAULT_MAX_WORKERS = 4
 
 def get_diary_summary(diary_path):
     with open(diary_path, 'r', encoding='utf-8') as f:
         diary_content = f.read()
     
-    with open(diary_template_path, 'r', encoding='utf-8') as f:
-        template_content = f.read()
-    
     # Remove template content
-    cleaned_content = get_non_empty_headers_content(diary_content, template_content)
+    cleaned_content = get_non_empty_headers_content(diary_content, load_template(diary_template_path))
 
     # Summarize the cleaned content
     summary = qwen2_summary(cleaned_content)
     
     return summary
 
-def add_summary_to_diary(diary_content, template_content=None):
+def get_cached_summary(diary_text: str, cache: SummaryCache = None, notify=None, sections=None) -> str:
+    """
+    Summarize diary_text, reusing a cached summary of the same text when possible.
+    
+    Args:
+        diary_text (str): Cleaned diary text
+        cache (SummaryCache): Summary cache, or None to always call the model
+        notify (callable): Called with 'cache_hit' or 'summarizing', if given
+        sections (list[tuple[str, str]]): The (header, content) sections the
+            text was joined from, used if it is too long for one prompt
+        
+    Returns:
+        str: Summary of the text
+    """
+    key = None
+    if cache is not None:
+        key = make_cache_key(diary_text, summary_model_id(), SUMMARY_PROMPT_VERSION, summary_cache_options())
+        summary = cache.get(key)
+        if summary is not None:
+            if notify:
+                notify('cache_hit')
+            return summary
+    
+    if notify:
+        notify('summarizing')
+    summary = summarize_text(diary_text, cache, sections)
+    if cache is not None:
+        cache.put(key, summary)
+    return summary
+
+def is_long_text(diary_text: str) -> bool:
+    """True if diary_text is too long for one prompt and is summarized by map-reduce."""
+    return estimate_tokens(diary_text) > CHUNK_TOKEN_BUDGET
+
+def summarize_text(diary_text: str, cache: SummaryCache = None, sections=None) -> str:
+    """
+    Summarize in one request, or by map-reduce over the diary's sections when
+    the text is too long for one prompt. Without sections, a long text is
+    chunked as one header-less section.
+    """
+    if is_long_text(diary_text):
+        return summarize_long_text(sections or [('', diary_text)], cache)
+    return qwen2_summary(diary_text)
+
+def stamp_has_summary(diary_content: str) -> str:
+    """Set has_summary: true in the front matter, adding front matter if there is none."""
+    match = re.match(r'---(\r?\n)(.*?)\r?\n---', diary_content, re.DOTALL)
+    if not match:
+        return f"---\nhas_summary: true\n---\n{diary_content}"
+    
+    newline = match.group(1)
+    front_matter = match.group(2)
+    if re.search(r'^has_summary:.*$', front_matter, re.MULTILINE):
+        front_matter = re.sub(r'^has_summary:.*$', 'has_summary: true', front_matter, flags=re.MULTILINE)
+    else:
+        front_matter = f"{front_matter}{newline}has_summary: true"
+    return diary_content[:match.start(2)] + front_matter + diary_content[match.end(2):]
+
+def insert_summary(diary_content: str, summary: str) -> str:
+    """
+    Put summary into the diary's empty span tag and stamp has_summary: true.
+    A diary without an empty span is returned unchanged.
+    """
+    updated_content, count = EMPTY_SPAN_PATTERN.subn(
+        lambda m: m.group(1) + '\n\t\t' + summary + '\n' + m.group(3), diary_content
+    )
+    if count == 0:
+        return diary_content
+    return stamp_has_summary(updated_content)
+
+def add_summary_to_diary(diary_content, template_content=None, cache=None):
     """
     Add a summary of the diary content to the span tag.
-    The summary will be generated based on the non-empty headers content.
+    The summary will be generated based on the non-empty headers content,
+    or taken from the summary cache if the same content was summarized before.
     """
+    # Nothing to fill: don't ask the model for a summary that can't be used
+    if not has_empty_span(diary_content):
+        return diary_content
+    
     # Get the diary content without template content
-    diary_text = get_non_empty_headers_content(diary_content, template_content)
+    sections = get_non_empty_sections(diary_content, template_content)
+    diary_text = format_sections(sections)
     
     if not diary_text:
         return diary_content  # Return original content if no content to summarize
     
     # Generate summary using ollama
-    
-    summary = qwen2_summary(diary_text)
+    summary = get_cached_summary(diary_text, cache, sections=sections)
     
     # Replace empty span content with summary
-    span_pattern = r'(<span[^>]*>)\s*(\n*)\s*(</span>)'
-    replacement = r'\1\n\t\t' + summary + r'\n\3'
-    
-    updated_content = re.sub(span_pattern, replacement, diary_content)
-    
-    return updated_content
+    return insert_summary(diary_content, summary)
 
 def process_diary_file(diary_path, template_path=None):
     """
     Process a diary file and add summary to it.
     Updates the original file with the summary added to the span tag.
+    Waits while another process is summarizing the same note.
     """
-    # Read diary content
-    with open(diary_path, 'r', encoding='utf-8') as f:
-        diary_content = f.read()
+    with NoteLock(diary_path):
+        # Read diary content
+        with open(diary_path, 'r', encoding='utf-8') as f:
+            diary_content = f.read()
+        
+        # Check if has_summary: true in front matter
+        if has_summary(diary_content):
+            print("Diary already has summary. no changes made.")
+            return diary_content
+        
+        # Load the compiled template if provided
+        template = load_template(template_path) if template_path else None
+        
+        # Add summary to diary
+        updated_content = add_summary_to_diary(diary_content, template)
+        
+        # Write the updated content back to the file, unless it was edited meanwhile
+        if updated_content != diary_content:
+            if note_changed_since(diary_path, content_hash(diary_content)):
+                print("Diary was edited while being summarized. no changes made.")
+                with open(diary_path, 'r', encoding='utf-8') as f:
+                    return f.read()
+            atomic_write_text(diary_path, updated_content)
+        
+        return updated_content
+
+def prepare_diary_update(diary_path: str, template_content=None, manifest: VaultManifest = None,
+                         parsed: ParsedNote = None) -> dict:
+    """
+    Read a diary and work out the text to summarize, without calling the model.
     
-    # Check if has_summary: true in front matter
-    if has_summary(diary_content):
-        print("Diary already has summary. no changes made.")
-        return diary_content
+    Args:
+        diary_path (str): Path to the diary file
+        template_content: Diary template text or CompiledTemplate, if any
+        manifest (VaultManifest): Vault manifest, used to skip notes that were only touched
+        parsed (ParsedNote): The note as parse_vault read it, if it was; its
+            text is used if the note has not changed since
+        
+    Returns:
+        dict: path, status ('pending', 'skipped' or 'failed'), the hash of the
+            content, the error message and the elapsed seconds. Pending
+            results also carry diary_content, the cleaned diary_text, the
+            diary_sections it was joined from if it is too long for one
+            prompt, and the note's lock, held until write_diary_update. A note locked by
+            another process is skipped, with no hash.
+    """
+    result = {'path': diary_path, 'status': 'skipped', 'content': None, 'hash': None, 'error': None}
+    start = time.perf_counter()
+    lock = NoteLock(diary_path)
+    if not lock.acquire():
+        result['seconds'] = time.perf_counter() - start
+        return result
+    try:
+        with pipeline_metrics.span('read'):
+            with open(diary_path, 'r', encoding='utf-8') as f:
+                diary_content = f.read()
+        result['hash'] = content_hash(diary_content)
+        
+        touched_only = manifest is not None and manifest.is_unchanged(diary_path, diary_content)
+        if not touched_only and not has_summary(diary_content) and has_empty_span(diary_content):
+            sections = None
+            if parsed is not None and parsed.hash == result['hash']:
+                diary_text = parsed.text
+            else:
+                sections = get_non_empty_sections(diary_content, template_content)
+                diary_text = format_sections(sections)
+            if diary_text:
+                result['status'] = 'pending'
+                result['diary_content'] = diary_content
+                result['diary_text'] = diary_text
+                if is_long_text(diary_text):
+                    # Chunked by section, see summarize_long_text
+                    result['diary_sections'] = sections or get_non_empty_sections(diary_content, template_content)
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
     
-    # Read template content if provided
-    template_content = None
-    if template_path:
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template_content = f.read()
+    if result['status'] == 'pending':
+        result['lock'] = lock
+    else:
+        lock.release()
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def finish_diary_update(result: dict, summary: str):
+    """Insert summary into a pending result, marking it 'updated' or 'skipped'."""
+    diary_content = result.pop('diary_content')
+    result.pop('diary_text', None)
+    result.pop('diary_sections', None)
+    updated_content = insert_summary(diary_content, summary)
+    if updated_content != diary_content:
+        result['status'] = 'updated'
+        result['content'] = updated_content
+        # What was read, so write_diary_update can tell whether the note changed since
+        result['read_hash'] = result['hash']
+        result['hash'] = content_hash(updated_content)
+    else:
+        result['status'] = 'skipped'
+
+def deferred_diary_update(diary_path: str) -> dict:
+    """Result for a note the run budget did not leave time for; it is not read."""
+    return {'path': diary_path, 'status': 'deferred', 'content': None, 'hash': None, 'error': None, 'seconds': 0.0}
+
+def defer_diary_update(result: dict):
+    """Mark a pending result 'deferred': it keeps its lock until write_diary_update."""
+    result.pop('diary_content', None)
+    result.pop('diary_text', None)
+    result.pop('diary_sections', None)
+    result['status'] = 'deferred'
+
+def fail_diary_update(result: dict, error: str):
+    result.pop('diary_content', None)
+    result.pop('diary_text', None)
+    result.pop('diary_sections', None)
+    result['status'] = 'failed'
+    result['error'] = error
+
+def build_diary_update(diary_path: str, template_content=None, cache: SummaryCache = None,
+                       manifest: VaultManifest = None, emit=None, parsed: ParsedNote = None) -> dict:
+    """
+    Read a diary and generate its summary without writing anything back.
+    Safe to run from worker threads; the caller does the write-back.
     
-    # Add summary to diary
-    updated_content = add_summary_to_diary(diary_content, template_content)
+    Args:
+        diary_path (str): Path to the diary file
+        template_content: Diary template text or CompiledTemplate, if any
+        cache (SummaryCache): Summary cache shared by all workers, if any
+        manifest (VaultManifest): Vault manifest, used to skip notes that were only touched
+        emit (callable): Progress callback emit(event, path), if any
+        parsed (ParsedNote): The note as parse_vault read it, see prepare_diary_update
+        
+    Returns:
+        dict: path, status ('updated', 'skipped', 'failed' or 'deferred'), the updated
+            content, the hash of the final content, the error message and
+            the elapsed seconds
+    """
+    result = prepare_diary_update(diary_path, template_content, manifest, parsed)
+    if result['status'] == 'pending':
+        start = time.perf_counter()
+        try:
+            notify = (lambda event: emit(event, diary_path)) if emit else None
+            finish_diary_update(result, get_cached_summary(
+                result['diary_text'], cache, notify, result.get('diary_sections')
+            ))
+        except GenerationPaused:
+            defer_diary_update(result)
+        except Exception as e:
+            fail_diary_update(result, str(e))
+        result['seconds'] += time.perf_counter() - start
+    return result
+
+def summarize_pending_batched(pending: list[dict], cache: SummaryCache = None,
+                              batch_size: int = 8, max_workers: int = DEFAULT_MAX_WORKERS,
+                              token_budget: int = DEFAULT_BATCH_TOKEN_BUDGET, emit=None,
+                              budget: RunBudget = None):
+    """
+    Summarize pending results several diaries per request, see qwen2_batch_summary.
+    Cached and duplicate texts are not sent again. Every result ends up
+    'updated', 'skipped' or 'failed', or 'deferred' if its batch was not
+    started before the run budget ran out or the run paused (see bounded_generation).
+    """
+    summaries = {}
+    misses = []
+    paths = {}
+    sections = {}
+    for result in pending:
+        text = result['diary_text']
+        paths.setdefault(text, []).append(result['path'])
+        if 'diary_sections' in result:
+            sections[text] = result['diary_sections']
+        if text in summaries:
+            if emit:
+                emit('cache_hit', result['path'])
+            continue
+        if len(paths[text]) > 1:
+            # Duplicate of a text that is already waiting for the model
+            continue
+        cached = None
+        if cache is not None:
+            cached = cache.get(make_cache_key(text, summary_model_id(), SUMMARY_PROMPT_VERSION, summary_cache_options()))
+        if cached is not None:
+            summaries[text] = cached
+            if emit:
+                emit('cache_hit', result['path'])
+        else:
+            misses.append(text)
+    
+    def run_batch(indexes):
+        texts = [misses[i] for i in indexes]
+        if (budget is not None and budget.exhausted()) or generation_paused():
+            return texts, None, None, 0.0
+        if len(texts) == 1:
+            # Over-budget texts end up alone in a batch; long ones are chunked
+            batch_call = lambda: [summarize_text(texts[0], cache, sections.get(texts[0]))]
+        else:
+            batch_call = lambda: qwen2_batch_summary(texts)
+        if emit:
+            for text in texts:
+                for path in paths[text]:
+                    emit('summarizing', path)
+        start = time.perf_counter()
+        try:
+            return texts, batch_call(), None, time.perf_counter() - start
+        except GenerationPaused:
+            return texts, None, None, time.perf_counter() - start
+        except Exception as e:
+            return texts, None, str(e), time.perf_counter() - start
     
-    # Write the updated content back to the file
-    with open(diary_path, 'w', encoding='utf-8') as f:
-        f.write(updated_content)
+    errors = {}
+    seconds = {}
+    deferred = set()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for texts, batch_summaries, error, elapsed in executor.map(run_in_context(run_batch), pack_batches(misses, batch_size, token_budget)):
+            for i, text in enumerate(texts):
+                seconds[text] = elapsed
+                if error is not None:
+                    errors[text] = error
+                    continue
+                if batch_summaries is None:
+                    deferred.add(text)
+                    continue
+                summaries[text] = batch_summaries[i]
+                if cache is not None:
+                    cache.put(make_cache_key(text, summary_model_id(), SUMMARY_PROMPT_VERSION, summary_cache_options()),
+                              batch_summaries[i])
     
-    return updated_content
+    for result in pending:
+        text = result['diary_text']
+        result['seconds'] += seconds.get(text, 0.0)
+        if text in summaries:
+            finish_diary_update(result, summaries[text])
+        elif text in deferred:
+            defer_diary_update(result)
+        else:
+            fail_diary_update(result, errors.get(text, "No summary returned"))
+
+def note_changed_since(diary_path: str, digest: str) -> bool:
+    """True if the note on disk no longer hashes to digest, e.g. it was edited while being summarized."""
+    with open(diary_path, 'r', encoding='utf-8') as f:
+        return content_hash(f.read()) != digest
+
+def release_diary_update(result: dict):
+    """Release the note lock a pending or summarized result still holds, if any."""
+    lock = result.pop('lock', None)
+    if lock is not None:
+        lock.release()
+
+def release_unwritten(futures):
+    """Wait for futures whose results will never be written and release their note locks."""
+    for future in futures:
+        future.cancel()
+    wait(futures)
+    for future in futures:
+        if not future.cancelled() and future.exception() is None:
+            release_diary_update(future.result())
+
+def map_in_order(executor, fn, items, ahead: int):
+    """
+    Like executor.map, but with at most ahead items started beyond the one
+    being consumed, so only that many results hold a note lock while they
+    wait for their turn to be written. Locks of results never consumed are
+    released when the caller stops early.
+    """
+    started = deque()
+    try:
+        for item in items:
+            started.append(executor.submit(fn, item))
+            if len(started) > ahead:
+                yield started.popleft().result()
+        while started:
+            yield started.popleft().result()
+    finally:
+        release_unwritten(started)
 
-def has_summary(diary_content: str) -> bool:
+def write_diary_update(result: dict, manifest: VaultManifest = None, emit=None,
+                       dir_sync: DirectorySync = None):
+    """
+    Write an 'updated' result back to its file atomically, release the
+    note's lock and record the outcome in the manifest. A note edited since
+    it was read is not written but 'deferred', so the edit is kept and the
+    note summarized again. Emits 'written', 'skipped', 'failed' or 'deferred'.
     """
-    Check if the diary content has has_summary: true in its front matter.
+    try:
+        if result['status'] == 'updated':
+            try:
+                with pipeline_metrics.span('write'):
+                    if note_changed_since(result['path'], result.pop('read_hash')):
+                        pipeline_metrics.increment('notes_edited_during_summary_total')
+                        result['status'] = 'deferred'
+                    else:
+                        atomic_write_text(result['path'], result['content'], dir_sync)
+            except Exception as e:
+                result['status'] = 'failed'
+                result['error'] = str(e)
+    finally:
+        release_diary_update(result)
+    if result['status'] == 'failed':
+        print(f"Error processing {result['path']}: {result['error']}")
+    elif manifest is not None and result['hash'] is not None and result['status'] != 'deferred':
+        # No hash: the note was locked by another process and never read.
+        # Deferred notes stay out, so the next run picks them up.
+        manifest.record(result['path'], result['hash'])
+    result['content'] = None
+    
+    if emit:
+        event = {'updated': 'written'}.get(result['status'], result['status'])
+        emit(event, result['path'], seconds=result['seconds'], error=result['error'])
+
+def warm_up_model():
+    """Load the summary model ahead of a bulk run, ignoring errors."""
+    try:
+        warm_up_summary_model()
+    except Exception as e:
+        print(f"Error warming up the summary model: {str(e)}")
+
+def summarize_diary_folder(diary_folder: str, template_path: str = diary_template_path,
+                           max_workers: int = DEFAULT_MAX_WORKERS, cache: SummaryCache = None,
+                           manifest: VaultManifest = None, batch_size: int = 1,
+                           on_event=None, diary_files: list[str] = None, recursive: bool = False,
+                           budget: RunBudget = None) -> list[dict]:
+    """
+    Summarize every diary in a folder with up to max_workers requests in flight.
+    Notes are processed in priority order (see prioritize_diary_files) and
+    written back one file at a time, in that order.
+    With a manifest only new or modified notes are opened, and the manifest
+    is updated with every note that did not fail. The notes are parsed on
+    all cores first (see parse_vault), so only those waiting for a summary
+    take a worker and a note lock.
+    With batch_size > 1 short diaries are packed several to a request.
     
     Args:
-        diary_content (str): Content of the diary file
+        diary_folder (str): Path to the folder containing diary entries
+        template_path (str): Path to the diary template
+        max_workers (int): Maximum number of concurrent summary requests
+        cache (SummaryCache): Summary cache, or None to always call the model
+        manifest (VaultManifest): Vault manifest, or None to process every note
+        batch_size (int): Maximum number of diaries per model request
+        on_event (callable): Called with a progress event dict, see iter_diary_summaries.
+            May be called from worker threads.
+        diary_files (list[str]): Process exactly these files instead of scanning the folder
+        recursive (bool): Include notes in subfolders when scanning
+        budget (RunBudget): Time or token budget; notes not started when it
+            runs out, or while a bounded run is paused, end up 'deferred'
         
     Returns:
-        bool: True if diary has has_summary: true in front matter, False otherwise
+        list[dict]: One result per processed diary file, see build_diary_update
     """
-    # Look for front matter between --- markers
-    front_matter_pattern = r'^---\n(.*?)\n---'
-    front_matter_match = re.search(front_matter_pattern, diary_content, re.DOTALL)
+    run_start = time.perf_counter()
     
-    if front_matter_match:
-        front_matter = front_matter_match.group(1)
-        # Look for has_summary: true in front matter
-        has_summary_match = re.search(r'has_summary:\s*true', front_matter, re.IGNORECASE)
-        return bool(has_summary_match)
+    def emit(event, path, **fields):
+        if on_event:
+            on_event({'event': event, 'path': path, 'elapsed': time.perf_counter() - run_start, **fields})
+    
+    if diary_files is None:
+        if manifest is not None:
+            diary_files = manifest.changed_files(diary_folder, recursive)
+        else:
+            diary_files = [path for path, _ in scan_notes(diary_folder, recursive)]
+    for path in diary_files:
+        emit('queued', path)
+    
+    # Renamed notes are made durable with one folder fsync at the end
+    dir_sync = DirectorySync()
+    results = []
+    
+    # Parse the notes on all cores first and only hand the ones waiting for a
+    # summary to the workers, which lock and read them again and reuse the
+    # parsed text if they did not change meanwhile
+    waiting = {}
+    for note in parse_vault(diary_folder, template_path, paths=diary_files):
+        if note.error is None and not (note.needs_summary and note.text):
+            result = {'path': note.path, 'status': 'skipped', 'content': None, 'hash': note.hash,
+                      'error': None, 'seconds': 0.0}
+            write_diary_update(result, manifest, emit, dir_sync)
+            results.append(result)
+        else:
+            waiting[note.path] = note
+    diary_files = prioritize_diary_files(list(waiting))
+    
+    template = load_template(template_path) if template_path else None
+    # Chunked long diaries fan out inside their worker; the slots keep the
+    # whole run at max_workers requests in flight
+    with request_slots(max_workers), ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        if diary_files:
+            # Load the model while the first notes are read; a failed warm-up
+            # is not an error, the summary requests report it if it persists
+            executor.submit(warm_up_model)
+        if batch_size > 1:
+            # Prepared notes hold their lock until written, so prepare one
+            # round of batches at a time rather than the whole vault
+            window = batch_size * max(1, max_workers)
+            for start in range(0, len(diary_files), window):
+                futures = [executor.submit(prepare_diary_update, path, template, manifest, waiting[path])
+                           for path in diary_files[start:start + window]]
+                try:
+                    prepared = [future.result() for future in futures]
+                    pending = [result for result in prepared if result['status'] == 'pending']
+                    summarize_pending_batched(pending, cache, batch_size, max_workers, emit=emit, budget=budget)
+                    for result in prepared:
+                        write_diary_update(result, manifest, emit, dir_sync)
+                    results += prepared
+                finally:
+                    release_unwritten(futures)
+        else:
+            # Results come in submission order, so write-back stays ordered
+            def build(path):
+                if (budget is not None and budget.exhausted()) or generation_paused():
+                    return deferred_diary_update(path)
+                return build_diary_update(path, template, cache, manifest, emit, waiting[path])
+            
+            for result in map_in_order(executor, run_in_context(build), diary_files, 2 * max(1, max_workers)):
+                write_diary_update(result, manifest, emit, dir_sync)
+                results.append(result)
+    
+    dir_sync.flush()
+    if manifest is not None:
+        manifest.save()
+    return results
+
+def format_summary_results(results: list[dict], cache_stats: dict = None, elapsed: float = None,
+                           stop_reason: str = "the run budget") -> str:
+    """Format per-file results as a short report, one line per failed file and per deferred file."""
+    counts = {'updated': 0, 'skipped': 0, 'failed': 0, 'deferred': 0}
+    for result in results:
+        counts[result['status']] += 1
     
-    return False
+    lines = [f"Successfully updated summaries for {counts['updated']} diary entries "
+             f"({counts['skipped']} skipped, {counts['failed']} failed)"]
+    if cache_stats:
+        lines.append(f"Summary cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                     f"{cache_stats['entries']} entries")
+    for result in results:
+        if result['status'] == 'failed':
+            lines.append(f"- {os.path.basename(result['path'])}: {result['error']}")
+    lines += format_remaining(results, elapsed, stop_reason)
+    return "\n".join(lines)
 
-def update_diary_summaries(diary_folder: str) -> tuple[bool, str]:
+def update_diary_summaries(diary_folder: str, max_workers: int = DEFAULT_MAX_WORKERS,
+                           template_path: str = diary_template_path, use_cache: bool = True,
+                           incremental: bool = True, batch_size: int = 1, on_event=None,
+                           diary_files: list[str] = None, recursive: bool = False,
+                           deadline_seconds: float = None, token_budget: int = None,
+                           bounded: bool = False) -> tuple[bool, str]:
     """
     Update summaries for all diary entries in the specified folder using the diary template.
     
     Args:
         diary_folder (str): Path to the folder containing diary entries
+        max_workers (int): Maximum number of concurrent summary requests
+        template_path (str): Path to the diary template
+        use_cache (bool): Reuse summaries stored in the vault's summary cache
+        incremental (bool): Only open notes that changed since the last run
+        batch_size (int): Maximum number of diaries per model request
+        on_event (callable): Progress callback, see summarize_diary_folder
+        diary_files (list[str]): Process exactly these files instead of scanning the folder
+        recursive (bool): Include notes in subfolders
+        deadline_seconds (float): Stop starting new notes after this many seconds
+        token_budget (int): Stop starting new notes after this many LLM tokens
+        bounded (bool): Stream and cap summaries, time out and retry requests and
+            pause when the server is down, see bounded_generation; with it,
+            requests in flight also stop at deadline_seconds
         
     Returns:
         tuple[bool, str]: Success status and message
     """
-    import os
-    import glob
-    
     try:
         # Verify folder exists
         if not os.path.exists(diary_folder):
             return False, "Diary folder does not exist"
         
-        # Get all markdown files in the folder
-        diary_files = glob.glob(os.path.join(diary_folder, "*.md"))
+        cache = SummaryCache.for_vault(diary_folder) if use_cache else None
+        manifest = VaultManifest.for_vault(diary_folder) if incremental else None
+        budget = None
+        if deadline_seconds is not None or token_budget is not None:
+            budget = RunBudget(deadline_seconds, token_budget)
+        limits = bounded_generation(run_seconds=deadline_seconds) if bounded else nullcontext()
+        try:
+            start = time.perf_counter()
+            with limits:
+                results = summarize_diary_folder(diary_folder, template_path, max_workers, cache, manifest,
+                                                 batch_size, on_event, diary_files, recursive, budget)
+            elapsed = time.perf_counter() - start
+            cache_stats = None
+            if cache is not None:
+                cache.evict()
+                cache_stats = cache.stats()
+        finally:
+            if cache is not None:
+                cache.close()
         
-        if not diary_files:
-            return False, "No diary files found in the specified folder"
+        write_metrics(diary_folder)
         
-        # Process each diary file using the existing function
-        processed_count = 0
-        for diary_path in diary_files:
-            try:
-                process_diary_file(diary_path, diary_template_path)
-                processed_count += 1
-            except Exception as e:
-                print(f"Error processing {diary_path}: {str(e)}")
-                continue
+        if not results:
+            if manifest is not None and manifest.entries:
+                return True, "All diary summaries are up to date"
+            return False, "No diary files found in the specified folder"
         
-        return True, f"Successfully updated summaries for {processed_count} diary entries"
+        stop_reason = "an unresponsive LLM server" if bounded and llm_circuit.is_open() else "the run budget"
+        return True, format_summary_results(results, cache_stats, elapsed, stop_reason)
         
     except Exception as e:
         return False, f"Error updating diary summaries: {str(e)}"
 
+def write_metrics(diary_folder: str):
+    """
+    Export the pipeline metrics to metrics.json and metrics.prom (Prometheus
+    text format, e.g. for node_exporter's textfile collector) in the vault's
+    hidden folder.
+    """
+    atomic_write_text(state_path(diary_folder, "metrics.json"), pipeline_metrics.to_json())
+    atomic_write_text(state_path(diary_folder, "metrics.prom"), pipeline_metrics.to_prometheus())
+
+def profile_diary_file(diary_path: str, template_path: str = diary_template_path,
+                       output_path: str = None, limit: int = 30) -> str:
+    """
+    Run the read/parse/strip/summarize steps for one diary under cProfile,
+    without writing the diary back.
+    
+    Args:
+        diary_path (str): Path to the diary file
+        template_path (str): Path to the diary template
+        output_path (str): Also dump the raw profile here (for snakeviz etc.), if given
+        limit (int): Number of functions in the report
+        
+    Returns:
+        str: Report of the functions with the highest cumulative time
+    """
+    import cProfile
+    import io
+    import pstats
+    
+    template = load_template(template_path) if template_path else None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    result = {}
+    try:
+        result = build_diary_update(diary_path, template)
+    finally:
+        profiler.disable()
+        # Nothing is written back, so the note's lock is not held until a write
+        release_diary_update(result)
+    
+    if output_path:
+        profiler.dump_stats(output_path)
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(limit)
+    return report.getvalue()
+
+def iter_diary_summaries(diary_folder: str, **kwargs):
+    """
+    Run update_diary_summaries on a background thread and yield its progress
+    events on the calling thread, so a UI can render them as they happen.
+    
+    Every event is a dict with 'event', 'path' and 'elapsed' (seconds since the
+    run started). Events are, per file: 'queued', then 'cache_hit' or
+    'summarizing', then one of 'written', 'skipped' or 'failed' carrying
+    'seconds' and 'error'. The last event is 'done' with 'success' and
+    'message' from update_diary_summaries.
+    
+    Args:
+        diary_folder (str): Path to the folder containing diary entries
+        **kwargs: Passed on to update_diary_summaries
+    """
+    events = queue.Queue()
+    start = time.perf_counter()
+    
+    def run():
+        success, message = update_diary_summaries(diary_folder, on_event=events.put, **kwargs)
+        events.put({'event': 'done', 'path': None, 'elapsed': time.perf_counter() - start,
+                    'success': success, 'message': message})
+    
+    threading.Thread(target=run, daemon=True).start()
+    while True:
+        event = events.get()
+        yield event
+        if event['event'] == 'done':
+            return
+
 if __name__ == "__main__":
     # Example usage
     diary_path = r"C:\Users\lucas\Documents\road\diary\2024-12-20.md"
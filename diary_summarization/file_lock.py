@@ -0,0 +1,95 @@
+"""
+Cross-process note locks.
+
+A note is locked while it is being summarized, so the watcher daemon, the
+Streamlit app and CLI runs never summarize the same note at the same time.
+Locks are advisory OS locks (flock on POSIX, msvcrt on Windows) on a small
+file per note in the temp folder, so they are released when the holder
+exits, even if it crashes.
+"""
+
+import hashlib
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+LOCK_DIR_NAME = "obsidian_ai_locks"
+
+def lock_path(note_path: str) -> str:
+    """Lock file of a note; every process derives the same path from the note's real path."""
+    lock_dir = os.path.join(tempfile.gettempdir(), LOCK_DIR_NAME)
+    os.makedirs(lock_dir, exist_ok=True)
+    digest = hashlib.sha1(os.path.realpath(note_path).encode('utf-8')).hexdigest()
+    return os.path.join(lock_dir, f"{digest}.lock")
+
+class NoteLock:
+    """Exclusive lock on one note, held until release()."""
+
+    def __init__(self, note_path: str):
+        self.note_path = note_path
+        self.path = lock_path(note_path)
+        self._fd = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, blocking: bool = False) -> bool:
+        """
+        Take the lock.
+
+        Args:
+            blocking (bool): Wait for the current holder instead of giving up
+
+        Returns:
+            bool: True if the lock is now held, False if another holder has it
+        """
+        if self._fd is not None:
+            return True
+        fd = None
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            elif blocking:
+                # LK_LOCK gives up after about 10 seconds; keep waiting like flock does
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            if fd is not None:
+                os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        if not self.acquire(blocking=True):
+            raise Exception(f"Error locking note: could not lock {self.note_path}")
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
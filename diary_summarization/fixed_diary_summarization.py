@@ -1,51 +1,170 @@
-from crewai import LLM, Agent, Task, Crew
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
 import re
+import threading
 from datetime import datetime
 import os
 from pathlib import Path
+from diary_summarization.llm_backends import LLMBackend
+from diary_summarization.vault_manifest import VaultManifest, content_hash
 
-# Load environment variables
-load_dotenv()
-print(os.getenv("OPENAI_API_KEY"))
-# Configure OpenAI API
-os.environ['OPENAI_MODEL_NAME'] = 'gpt-4o-mini'
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+# crewAI and dotenv are imported when a DiaryProcessor is created, not when
+# this module is imported: crewAI alone takes seconds to load.
+
+def configure_openai():
+    """Load OPENAI_API_KEY from .env and choose the OpenAI model crewAI uses."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    os.environ.setdefault('OPENAI_MODEL_NAME', 'gpt-4o-mini')
+
+def backend_crew_llm(backend: LLMBackend):
+    """
+    Wrap one of our LLM backends as a crewAI LLM, so the agents' requests go
+    through it, e.g. a RecordingBackend or ReplayBackend instead of OpenAI.
+    
+    Args:
+        backend (LLMBackend): Backend that answers the agents
+        
+    Returns:
+        crewai.BaseLLM: LLM to pass to DiaryProcessor or an Agent
+    """
+    from crewai import BaseLLM
+
+    class BackendLLM(BaseLLM):
+        def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs) -> str:
+            return backend.chat(messages, options={'temperature': self.temperature}
+                                if self.temperature is not None else None)['content']
+
+        def supports_function_calling(self) -> bool:
+            return False
+
+        def supports_stop_words(self) -> bool:
+            return False
+
+    return BackendLLM(model=backend.model)
+
+# "full" runs the analyze -> summarize -> format chain, three LLM turns per
+# diary; "fast" asks for the summary in a single turn.
+PROCESSOR_MODES = ('full', 'fast')
+DEFAULT_PROCESSOR_WORKERS = 4
+# The processor writes no summaries into notes, so it must not mark notes as
+# done in the manifest update_diary_summaries reads
+CREWAI_MANIFEST_FILENAME = "manifest_crewai.json"
 
 class DiaryProcessor:
-    def __init__(self, diary_folder: str):
+    def __init__(self, diary_folder: str, mode: str = 'full', llm=None, verbose: bool = False,
+                 max_workers: int = DEFAULT_PROCESSOR_WORKERS):
+        """
+        Args:
+            diary_folder (str): Path to the folder containing diary entries
+            mode (str): "full" for the three-agent chain, "fast" for one summary call
+            llm: crewAI LLM, model name or LLMBackend for every agent, by default crewAI's OpenAI model
+            verbose (bool): Log every agent step
+            max_workers (int): Diaries processed at once by process_diary_files
+        """
+        from crewai import Agent
+        configure_openai()
+        if mode not in PROCESSOR_MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of: {', '.join(PROCESSOR_MODES)}")
         self.diary_folder = Path(diary_folder)
+        self.mode = mode
+        self.verbose = verbose
+        self.max_workers = max_workers
         
-        # Create OpenAI LLM configuration
-
+        if isinstance(llm, LLMBackend):
+            llm = backend_crew_llm(llm)
+        # Agents only take an llm when one is given, otherwise crewAI picks OPENAI_MODEL_NAME
+        llm_config = {'llm': llm} if llm is not None else {}
         
         # Create agents with specific roles
         self.analyzer_agent = Agent(
             role='Diary Analyzer',
             goal='Analyze diary entries and extract key information',
             backstory='Expert in analyzing personal diary entries and extracting emotional patterns and key events. You understand both English and Chinese content.',
-            verbose=True,
+            verbose=verbose,
             allow_delegation=False,
-      
+            **llm_config,
         )
         
         self.summarizer_agent = Agent(
             role='Content Summarizer',
             goal='Create concise summaries of diary content',
             backstory='Specialist in condensing diary entries while preserving important emotional and factual content. You can work with both English and Chinese content.',
-            verbose=True,
+            verbose=verbose,
             allow_delegation=False,
+            **llm_config,
         )
         
         self.template_agent = Agent(
             role='Template Formatter',
             goal='Format analyzed content into the specified template',
             backstory='Expert in organizing and formatting content according to predefined templates. You can handle both English and Chinese content.',
-            verbose=True,
+            verbose=verbose,
             allow_delegation=False,
+            **llm_config,
+        )
+        
+        # The crew is built once; kickoff fills {content} into the task descriptions.
+        # kickoff mutates the crew, so every worker thread runs its own copy.
+        self.crew = self.build_crew()
+        self._local = threading.local()
+        self._usage_lock = threading.Lock()
+        self.usage = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'successful_requests': 0}
+
+    def build_crew(self):
+        """Build the crew for self.mode, with the diary text as the {content} input."""
+        from crewai import Task, Crew
+        
+        if self.mode == 'fast':
+            summary_task = Task(
+                description="Summarize this diary entry in the first person, in 50-100 characters and in the "
+                            "diary's language, covering the main events and the emotional state:\n\n{content}",
+                agent=self.summarizer_agent,
+                expected_output="A first-person summary of the diary entry, 50-100 characters"
+            )
+            return Crew(agents=[self.summarizer_agent], tasks=[summary_task], verbose=self.verbose)
+        
+        # Create tasks for the agents
+        analysis_task = Task(
+            description="Analyze the diary entry and identify key themes, emotions, and events:\n\n{content}",
+            agent=self.analyzer_agent,
+            expected_output="A detailed analysis of the diary entry's themes, emotions, and key events"
+        )
+
+        summary_task = Task(
+            description="Create a concise summary of the diary entry focusing on main points and emotional state",
+            agent=self.summarizer_agent,
+            expected_output="A concise summary of the diary entry highlighting main points and emotional state"
+        )
+
+        template_task = Task(
+            description="Format the analyzed content into the specified template structure",
+            agent=self.template_agent,
+            expected_output="The diary content formatted according to the template structure"
+        )
+
+        return Crew(
+            agents=[self.analyzer_agent, self.summarizer_agent, self.template_agent],
+            tasks=[analysis_task, summary_task, template_task],
+            verbose=self.verbose
         )
 
+    def _thread_crew(self):
+        crew = getattr(self._local, 'crew', None)
+        if crew is None:
+            crew = self._local.crew = self.crew.copy()
+        return crew
+
+    def run_crew(self, content: str) -> str:
+        """Kick off this thread's crew on one diary and add its token usage to self.usage."""
+        output = self._thread_crew().kickoff(inputs={'content': content})
+        token_usage = getattr(output, 'token_usage', None)
+        if token_usage is not None:
+            with self._usage_lock:
+                for field in self.usage:
+                    self.usage[field] += getattr(token_usage, field, 0) or 0
+        return str(output)
+
     def extract_metadata(self, content: str) -> Dict[str, Any]:
         """Extract metadata from diary content"""
         metadata = {
@@ -71,31 +190,7 @@ class DiaryProcessor:
             return f.read()
 
     def process_diary(self, content: str) -> str:
-        # Create tasks for the agents
-        analysis_task = Task(
-            description="Analyze the diary entry and identify key themes, emotions, and events",
-            agent=self.analyzer_agent,
-            expected_output="A detailed analysis of the diary entry's themes, emotions, and key events"
-        )
-
-        summary_task = Task(
-            description="Create a concise summary of the diary entry focusing on main points and emotional state",
-            agent=self.summarizer_agent,
-            expected_output="A concise summary of the diary entry highlighting main points and emotional state"
-        )
-
-        template_task = Task(
-            description="Format the analyzed content into the specified template structure",
-            agent=self.template_agent,
-            expected_output="The diary content formatted according to the template structure"
-        )
-
-        # Create and run the crew
-        crew = Crew(
-            agents=[self.analyzer_agent, self.summarizer_agent, self.template_agent],
-            tasks=[analysis_task, summary_task, template_task],
-            verbose=True
-        )
+        summary = self.run_crew(content)
 
         # Get metadata
         metadata = self.extract_metadata(content)
@@ -120,30 +215,73 @@ workSession: {metadata['workSession']}
       data-img='diary/timeline-image/b.png' 
       data-type='range' 
       data-end='{current_date}'> 
-    {crew.kickoff()}
+    {summary}
 </span>
 """
         return template
 
-    def process_diary_files(self) -> Dict[str, str]:
-        """Process all markdown files in the diary folder"""
+    def process_diary_files(self, changed_only: bool = False) -> Dict[str, str]:
+        """Process all markdown files in the diary folder.
+        
+        With changed_only, only files that are new or modified since the last
+        changed_only run (according to the processor's own manifest) are read.
+        """
         processed_entries = {}
         
         # Ensure diary folder exists
         if not self.diary_folder.exists():
             raise FileNotFoundError(f"Diary folder not found: {self.diary_folder}")
         
-        # Process each markdown file
-        for file_path in self.diary_folder.glob('*.md'):
-            try:
-                content = self.load_diary_content(str(file_path))
-                processed_content = self.process_diary(content)
-                processed_entries[file_path.name] = processed_content
-            except Exception as e:
-                print(f"Error processing {file_path.name}: {str(e)}")
+        manifest = VaultManifest.for_vault(str(self.diary_folder), CREWAI_MANIFEST_FILENAME) if changed_only else None
+        if manifest is not None:
+            file_paths = [Path(p) for p in manifest.changed_files(str(self.diary_folder))]
+        else:
+            file_paths = self.diary_folder.glob('*.md')
+        
+        def process(file_path):
+            content = self.load_diary_content(str(file_path))
+            if manifest is not None and manifest.is_unchanged(str(file_path), content):
+                return content, None
+            return content, self.process_diary(content)
         
+        # Up to max_workers diaries are with the model at once; results are
+        # handled in file order
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            futures = [(file_path, executor.submit(process, file_path)) for file_path in file_paths]
+            for file_path, future in futures:
+                try:
+                    content, processed_content = future.result()
+                    if processed_content is not None:
+                        processed_entries[file_path.name] = processed_content
+                    if manifest is not None:
+                        manifest.record(str(file_path), content_hash(content))
+                except Exception as e:
+                    print(f"Error processing {file_path.name}: {str(e)}")
+        
+        if manifest is not None:
+            manifest.save()
         return processed_entries
 
+def run_diary_processor(diary_folder: str, changed_only: bool = True, mode: str = 'full') -> tuple[bool, str]:
+    """
+    Run the crewAI DiaryProcessor over a folder and print what it produced.
+    
+    Args:
+        diary_folder (str): Path to the folder containing diary entries
+        changed_only (bool): Only process notes changed since the last run
+        mode (str): "full" or "fast", see DiaryProcessor
+        
+    Returns:
+        tuple[bool, str]: Success status and message
+    """
+    try:
+        processed_entries = DiaryProcessor(diary_folder, mode).process_diary_files(changed_only)
+        for filename, processed_content in processed_entries.items():
+            print(f"\n{filename}:\n{processed_content}")
+        return True, f"Processed {len(processed_entries)} diaries"
+    except Exception as e:
+        return False, f"Error processing diaries: {str(e)}"
+
 # Example usage
 if __name__ == "__main__":
     # Use the diary folder from your Documents
@@ -0,0 +1,244 @@
+"""
+Full-text search over the vault's diary sections.
+
+Sections (as cleaned by get_non_empty_sections) are tokenized into Latin
+words and CJK character bigrams, so mixed Chinese/English diaries need no
+dictionary or segmenter. The inverted index lives in a SQLite file in the
+vault's hidden folder: one row per term with its posting list compressed as
+varint (doc id delta, term frequency) pairs. Changed notes delete their
+sections and append new ones; stale postings are skipped at query time and
+dropped when the index is compacted. Queries are ranked with BM25.
+"""
+
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+
+from diary_summarization.parallel_parse import note_sections, parse_vault
+from diary_summarization.vault_manifest import scan_changes
+from diary_summarization.vault_state import state_path
+
+FULLTEXT_INDEX_FILENAME = "fulltext_index.sqlite"
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_CHARS = 40
+
+TOKEN_PATTERN = re.compile(r'[一-鿿]+|[A-Za-z0-9]+')
+
+def tokenize(text: str) -> list[str]:
+    """Latin words and digits lowercased, CJK runs as overlapping bigrams (a lone character as itself)."""
+    tokens = []
+    for run in TOKEN_PATTERN.findall(text.lower()):
+        if run[0] >= '一':
+            tokens.extend(run[i:i + 2] for i in range(max(1, len(run) - 1)))
+        else:
+            tokens.append(run)
+    return tokens
+
+def encode_postings(postings, last_id: int = 0) -> bytes:
+    """Varint-encode ascending (doc_id, tf) pairs as deltas from last_id."""
+    out = bytearray()
+    for doc_id, tf in postings:
+        for value in (doc_id - last_id, tf):
+            while value >= 0x80:
+                out.append((value & 0x7f) | 0x80)
+                value >>= 7
+            out.append(value)
+        last_id = doc_id
+    return bytes(out)
+
+def decode_postings(data: bytes):
+    """Yield the (doc_id, tf) pairs of an encoded posting list."""
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    doc_id = 0
+    for i in range(0, len(values), 2):
+        doc_id += values[i]
+        yield doc_id, values[i + 1]
+
+class FullTextIndex:
+    """Inverted index of diary sections, stored in SQLite."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS notes (
+                path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sections (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT NOT NULL, header TEXT NOT NULL, text TEXT NOT NULL, length INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sections_path ON sections(path);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT PRIMARY KEY, last_id INTEGER NOT NULL, data BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        # Section lengths of live sections, for BM25 and to skip stale postings
+        self._lengths = dict(self._conn.execute("SELECT id, length FROM sections"))
+
+    @classmethod
+    def for_vault(cls, diary_folder: str) -> "FullTextIndex":
+        """Open the index stored in the vault's hidden folder."""
+        return cls(state_path(diary_folder, FULLTEXT_INDEX_FILENAME))
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _meta(self, key: str) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _remove_note(self, note: str) -> int:
+        ids = [row[0] for row in self._conn.execute("SELECT id FROM sections WHERE path = ?", (note,))]
+        self._conn.execute("DELETE FROM sections WHERE path = ?", (note,))
+        self._conn.execute("DELETE FROM notes WHERE path = ?", (note,))
+        for doc_id in ids:
+            self._lengths.pop(doc_id, None)
+        return len(ids)
+
+    def _add_sections(self, note: str, sections: list[tuple[str, str]], new_postings: dict):
+        for header, text in sections:
+            tokens = tokenize(f"{header} {text}")
+            cursor = self._conn.execute("INSERT INTO sections (path, header, text, length) VALUES (?, ?, ?, ?)",
+                                        (note, header, text, len(tokens)))
+            doc_id = cursor.lastrowid
+            self._lengths[doc_id] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for term, tf in counts.items():
+                new_postings.setdefault(term, []).append((doc_id, tf))
+
+    def _append_postings(self, new_postings: dict):
+        for term, postings in new_postings.items():
+            row = self._conn.execute("SELECT last_id, data FROM postings WHERE term = ?", (term,)).fetchone()
+            last_id, data = row if row else (0, b'')
+            self._conn.execute("INSERT OR REPLACE INTO postings (term, last_id, data) VALUES (?, ?, ?)",
+                               (term, postings[-1][0], data + encode_postings(postings, last_id)))
+
+    def update(self, diary_folder: str, template_path: str = None, recursive: bool = False) -> dict:
+        """
+        Re-index the notes whose size or mtime changed and drop deleted ones.
+
+        Args:
+            diary_folder (str): Path to the vault
+            template_path (str): Diary template whose boilerplate is not indexed
+            recursive (bool): Also index notes in subfolders
+
+        Returns:
+            dict: Number of notes indexed and removed, and live sections
+        """
+        with self._lock:
+            known = {path: (size, mtime_ns) for path, size, mtime_ns
+                     in self._conn.execute("SELECT path, size, mtime_ns FROM notes")}
+            changed, removed = scan_changes(diary_folder, known, recursive)
+            if not changed and not removed:
+                return {'indexed': 0, 'removed': 0, 'sections': len(self._lengths)}
+
+            indexed = 0
+            with self._conn:
+                dead = self._meta('dead')
+                for note in removed:
+                    dead += self._remove_note(note)
+                new_postings = {}
+                for parsed in parse_vault(diary_folder, template_path, paths=changed, extract=note_sections):
+                    if parsed.error is not None:
+                        print(f"Error indexing {parsed.path}: {parsed.error}")
+                        continue
+                    note = os.path.relpath(parsed.path, diary_folder)
+                    dead += self._remove_note(note)
+                    self._add_sections(note, parsed.data, new_postings)
+                    self._conn.execute("INSERT INTO notes (path, size, mtime_ns) VALUES (?, ?, ?)",
+                                       (note, parsed.size, parsed.mtime_ns))
+                    indexed += 1
+                self._append_postings(new_postings)
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dead', ?)", (dead,))
+            if dead > 1000 and dead > len(self._lengths):
+                self.compact()
+            return {'indexed': indexed, 'removed': len(removed), 'sections': len(self._lengths)}
+
+    def compact(self):
+        """Rebuild every posting list from the live sections, dropping stale entries."""
+        with self._conn:
+            self._conn.execute("DELETE FROM postings")
+            new_postings = {}
+            for doc_id, header, text in self._conn.execute("SELECT id, header, text FROM sections ORDER BY id"):
+                counts = {}
+                for token in tokenize(f"{header} {text}"):
+                    counts[token] = counts.get(token, 0) + 1
+                for term, tf in counts.items():
+                    new_postings.setdefault(term, []).append((doc_id, tf))
+            self._append_postings(new_postings)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dead', 0)")
+        self._conn.execute("VACUUM")
+
+    def search(self, query: str, k: int = 10) -> list[dict]:
+        """
+        Return the k sections that best match the query, ranked with BM25.
+
+        Args:
+            query (str): Words or Chinese text to search for
+            k (int): Number of results
+
+        Returns:
+            list[dict]: Results with note, header, snippet and score, best first
+        """
+        with self._lock:
+            terms = list(dict.fromkeys(tokenize(query)))
+            lengths = self._lengths
+            if not terms or not lengths:
+                return []
+            doc_count = len(lengths)
+            avg_length = sum(lengths.values()) / doc_count
+            scores = {}
+            for term in terms:
+                row = self._conn.execute("SELECT data FROM postings WHERE term = ?", (term,)).fetchone()
+                if row is None:
+                    continue
+                postings = [(doc_id, tf) for doc_id, tf in decode_postings(row[0]) if doc_id in lengths]
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+            results = []
+            for doc_id, score in heapq.nlargest(k, scores.items(), key=lambda item: item[1]):
+                note, header, text = self._conn.execute(
+                    "SELECT path, header, text FROM sections WHERE id = ?", (doc_id,)).fetchone()
+                results.append({'note': note, 'header': header, 'snippet': make_snippet(text, terms), 'score': score})
+            return results
+
+def make_snippet(text: str, terms: list[str], width: int = SNIPPET_CHARS) -> str:
+    """Text around the first matching term, which is shown in bold."""
+    lowered = text.lower()
+    positions = [(lowered.find(term), term) for term in terms if lowered.find(term) >= 0]
+    if not positions:
+        return text[:2 * width]
+    position, term = min(positions)
+    start = max(0, position - width)
+    end = min(len(text), position + len(term) + width)
+    return (("…" if start > 0 else "") + text[start:position] + f"**{text[position:position + len(term)]}**"
+            + text[position + len(term):end] + ("…" if end < len(text) else ""))
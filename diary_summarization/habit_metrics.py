@@ -0,0 +1,192 @@
+"""
+Columnar store of numeric habit metrics.
+
+Every numeric frontmatter key (meditation, vocab, joggling, workSession or
+any other) becomes one float64 column over a dense daily calendar, saved as
+an .npz in the vault's hidden folder; days without a note are NaN. Only
+notes whose size or mtime changed are read again, and rolling averages,
+streaks and monthly totals are computed with vectorized NumPy operations.
+"""
+
+import datetime
+import json
+import os
+import re
+
+import numpy as np
+
+from diary_summarization.atomic_write import atomic_write_text
+from diary_summarization.markdown_parser import parse_diary
+from diary_summarization.parallel_parse import parse_vault
+from diary_summarization.vault_manifest import scan_changes
+from diary_summarization.vault_state import state_path
+
+HABITS_FILENAME = "habits.npz"
+HABIT_NOTES_FILENAME = "habits.json"
+
+FILENAME_DATE_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2})')
+
+def read_habit_values(content: str, filename: str = ""):
+    """
+    Return (date, {key: value}) for a note's numeric frontmatter, or None if
+    the note has no date. The date comes from the timeline span's data-date,
+    falling back to a YYYY-MM-DD in the file name.
+    """
+    doc = parse_diary(content)
+    candidates = [doc.span_data.get('date', '').strip()]
+    match = FILENAME_DATE_PATTERN.search(filename)
+    if match:
+        candidates.append(match.group(1))
+    for candidate in candidates:
+        try:
+            date = datetime.date.fromisoformat(candidate)
+            break
+        except ValueError:
+            continue
+    else:
+        return None
+    values = {
+        str(key): float(value) for key, value in doc.frontmatter.items()
+        # bool is an int subclass, but checkboxes are not quantities
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
+    return date.isoformat(), values
+
+def note_habit_values(path: str, content: str, template) -> tuple:
+    """parse_vault extract function, see read_habit_values."""
+    return read_habit_values(content, os.path.basename(path))
+
+class HabitStore:
+    """Dense daily columns of numeric frontmatter keys."""
+
+    def __init__(self, diary_folder: str):
+        self.diary_folder = diary_folder
+        self.columns_path = state_path(diary_folder, HABITS_FILENAME)
+        self.notes_path = state_path(diary_folder, HABIT_NOTES_FILENAME)
+        self.notes = {}
+        if os.path.exists(self.notes_path):
+            try:
+                with open(self.notes_path, 'r', encoding='utf-8') as f:
+                    self.notes = json.load(f)
+            except (OSError, ValueError):
+                self.notes = {}
+        self.start = None
+        self.columns = {}
+        if os.path.exists(self.columns_path) and self.notes:
+            with np.load(self.columns_path) as data:
+                if 'start' in data:
+                    self.start = data['start'][()]
+                    self.columns = {key[4:]: data[key] for key in data.files if key.startswith('col_')}
+
+    @property
+    def keys(self) -> list[str]:
+        return sorted(self.columns)
+
+    @property
+    def dates(self) -> np.ndarray:
+        """datetime64[D] calendar shared by every column."""
+        if self.start is None:
+            return np.array([], dtype='datetime64[D]')
+        length = len(next(iter(self.columns.values()))) if self.columns else 0
+        return self.start + np.arange(length)
+
+    def update(self, recursive: bool = False) -> dict:
+        """
+        Read the notes that changed since the last update and rebuild the columns.
+
+        Returns:
+            dict: Number of notes read and removed, and days covered
+        """
+        known = {note: (entry['size'], entry['mtime_ns']) for note, entry in self.notes.items()}
+        changed, removed = scan_changes(self.diary_folder, known, recursive)
+        read = 0
+        for parsed in parse_vault(self.diary_folder, paths=changed, extract=note_habit_values):
+            if parsed.error is not None:
+                print(f"Error reading habits from {parsed.path}: {parsed.error}")
+                continue
+            habit = parsed.data
+            self.notes[os.path.relpath(parsed.path, self.diary_folder)] = {
+                'size': parsed.size, 'mtime_ns': parsed.mtime_ns,
+                'date': habit[0] if habit else None, 'values': habit[1] if habit else {},
+            }
+            read += 1
+        for note in removed:
+            del self.notes[note]
+
+        if read or removed or (self.notes and not os.path.exists(self.columns_path)):
+            self._build_columns()
+            self._save()
+        return {'read': read, 'removed': len(removed), 'days': len(self.dates)}
+
+    def _build_columns(self):
+        dated = [entry for entry in self.notes.values() if entry['date'] and entry['values']]
+        self.columns = {}
+        if not dated:
+            self.start = None
+            return
+        days = np.array([entry['date'] for entry in dated], dtype='datetime64[D]')
+        self.start = days.min()
+        offsets = (days - self.start).astype(np.int64)
+        length = int(offsets.max()) + 1
+        keys = sorted({key for entry in dated for key in entry['values']})
+        for key in keys:
+            rows = np.array([i for i, entry in enumerate(dated) if key in entry['values']], dtype=np.int64)
+            values = np.array([dated[i]['values'][key] for i in rows], dtype=np.float64)
+            column = np.zeros(length, dtype=np.float64)
+            present = np.zeros(length, dtype=bool)
+            # Several notes on one day add up
+            np.add.at(column, offsets[rows], values)
+            present[offsets[rows]] = True
+            column[~present] = np.nan
+            self.columns[key] = column
+
+    def _save(self):
+        tmp_path = self.columns_path + ".tmp.npz"
+        arrays = {f"col_{key}": column for key, column in self.columns.items()}
+        if self.start is not None:
+            arrays['start'] = np.array(self.start)
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, self.columns_path)
+        atomic_write_text(self.notes_path, json.dumps(self.notes, ensure_ascii=False))
+
+    def rolling_mean(self, key: str, window: int = 7) -> np.ndarray:
+        """Mean over the last window days that have a value, NaN where none do."""
+        column = self.columns[key]
+        present = ~np.isnan(column)
+        sums = np.concatenate(([0.0], np.cumsum(np.where(present, column, 0.0))))
+        counts = np.concatenate(([0], np.cumsum(present)))
+        window_sums = sums[window:] - sums[:-window] if len(column) >= window else np.array([])
+        window_counts = counts[window:] - counts[:-window] if len(column) >= window else np.array([])
+        # The first window - 1 days average over the days seen so far
+        head = min(window - 1, len(column))
+        window_sums = np.concatenate((sums[1:head + 1], window_sums))
+        window_counts = np.concatenate((counts[1:head + 1], window_counts))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(window_counts > 0, window_sums / np.maximum(window_counts, 1), np.nan)
+
+    def streaks(self, key: str, threshold: float = 0.0) -> dict:
+        """
+        Runs of consecutive days whose value is above threshold.
+
+        Returns:
+            dict: 'current' streak ending on the last day and the 'longest' one
+        """
+        active = np.nan_to_num(self.columns[key], nan=-np.inf) > threshold
+        if not active.any():
+            return {'current': 0, 'longest': 0}
+        edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        lengths = ends - starts
+        current = int(lengths[-1]) if ends[-1] == len(active) else 0
+        return {'current': current, 'longest': int(lengths.max())}
+
+    def monthly_totals(self, key: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            tuple[np.ndarray, np.ndarray]: datetime64[M] months and the sum of each
+        """
+        column = np.nan_to_num(self.columns[key], nan=0.0)
+        months = self.dates.astype('datetime64[M]')
+        month_starts = np.flatnonzero(np.concatenate(([True], months[1:] != months[:-1])))
+        return months[month_starts], np.add.reduceat(column, month_starts)
@@ -0,0 +1,154 @@
+"""
+Single-pass parser for diary notes.
+
+Walks the note once, line by line, and produces a DiaryDocument with the YAML
+frontmatter, the timeline span (data attributes and body) and the header 1
+sections in order, each with its byte offsets in the original text. Nothing
+backtracks, so parse time is linear in the size of the note.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+
+_DATA_ATTR_PATTERN = re.compile(r'data-(\w+)\s*=\s*[\'"]([^\'"]*)[\'"]')
+
+@dataclass
+class Section:
+    """A header 1 section: its title, cleaned content and byte range."""
+    title: str
+    content: str
+    start: int
+    end: int
+
+@dataclass
+class DiaryDocument:
+    frontmatter: dict = field(default_factory=dict)
+    span_data: dict = field(default_factory=dict)
+    span_body: str = ''
+    sections: list = field(default_factory=list)
+
+    def headers(self) -> dict:
+        """Section contents keyed by title, like parse_markdown_template()['headers']."""
+        return {section.title: section.content for section in self.sections}
+
+def _is_header(line: str) -> bool:
+    return len(line) > 2 and line[0] == '#' and line[1] in ' \t' and line[2:].strip() != ''
+
+def _parse_span(text: str):
+    """Return the data attributes and the stripped body of a <span ...>...</span> text."""
+    tag_end = text.find('>')
+    return dict(_DATA_ATTR_PATTERN.findall(text[:tag_end])), text[tag_end + 1:text.find('</span>')].strip()
+
+def _join_lines(lines: list) -> str:
+    """Join section lines, dropping separators and keeping at most one blank line in a row."""
+    kept = []
+    blank = False
+    for line in lines:
+        if line.strip() == '---':
+            continue
+        if not line.strip():
+            if blank:
+                continue
+            blank = True
+        else:
+            blank = False
+        kept.append(line)
+    return '\n'.join(kept).strip()
+
+def parse_diary(content: str) -> DiaryDocument:
+    """
+    Parse a diary note in one pass.
+    
+    Args:
+        content (str): Markdown content of the note
+        
+    Returns:
+        DiaryDocument: Frontmatter, span data and header 1 sections
+    """
+    doc = DiaryDocument()
+    lines = content.split('\n')
+    offset = 0
+    index = 0
+
+    # Frontmatter: only when the note starts with a --- line
+    if lines and lines[0].rstrip() == '---':
+        for end in range(1, len(lines)):
+            if lines[end].rstrip() == '---':
+                try:
+                    import yaml  # deferred: only notes with frontmatter need it
+                    doc.frontmatter = yaml.safe_load('\n'.join(lines[1:end])) or {}
+                except yaml.YAMLError:
+                    doc.frontmatter = {}
+                if not isinstance(doc.frontmatter, dict):
+                    doc.frontmatter = {}
+                for line in lines[:end + 1]:
+                    offset += len(line.encode('utf-8')) + 1
+                index = end + 1
+                break
+
+    span_lines = None  # (line, start offset) pairs of a span whose </span> has not been seen yet
+    span_seen = False
+    in_fence = False
+    title = None
+    section_lines = []
+    section_start = offset
+
+    def close_section(end_offset):
+        if title is not None:
+            doc.sections.append(Section(title, _join_lines(section_lines), section_start, end_offset))
+
+    def feed(line, line_start):
+        nonlocal span_lines, span_seen, in_fence, title, section_lines, section_start
+        if line.lstrip().startswith('```'):
+            in_fence = not in_fence
+        elif not in_fence:
+            if not span_seen and '<span' in line:
+                span_seen = True
+                tag = line[line.find('<span'):]
+                if '</span>' in tag:
+                    doc.span_data, doc.span_body = _parse_span(tag)
+                else:
+                    span_lines = [(line, line_start)]
+                return
+            if _is_header(line):
+                close_section(line_start)
+                title = line[1:].strip()
+                section_lines = []
+                section_start = line_start
+                return
+
+        if title is not None:
+            section_lines.append(line)
+
+    def abandon_span():
+        # An unterminated span is not a span: its lines are ordinary note text
+        nonlocal span_lines
+        buffered, span_lines = span_lines, None
+        for line, line_start in buffered:
+            feed(line, line_start)
+
+    for raw_line in lines[index:]:
+        line_start = offset
+        # Offsets count the raw line, \r included, so they stay exact on CRLF notes
+        offset += len(raw_line.encode('utf-8')) + 1
+        line = raw_line.rstrip('\r')
+
+        if span_lines is not None:
+            if '</span>' in line:
+                span_lines.append((line, line_start))
+                text = '\n'.join(buffered for buffered, _ in span_lines)
+                doc.span_data, doc.span_body = _parse_span(text[text.find('<span'):])
+                span_lines = None
+                continue
+            if not _is_header(line):
+                span_lines.append((line, line_start))
+                continue
+            abandon_span()
+
+        feed(line, line_start)
+
+    if span_lines is not None:
+        abandon_span()
+    close_section(min(offset - 1, len(content.encode('utf-8'))))
+    return doc
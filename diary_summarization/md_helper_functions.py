@@ -53,7 +53,10 @@ ignore ---
 """
 
 import re
-import yaml
+
+from diary_summarization.markdown_parser import DiaryDocument, parse_diary
+from diary_summarization.compiled_template import CompiledTemplate
+from diary_summarization.metrics import pipeline_metrics
 
 def clean_content(content):
     """Remove extra newlines and separator lines (---), preserving YAML frontmatter."""
@@ -81,6 +84,7 @@ def extract_yaml_frontmatter(content):
     yaml_pattern = r"^---\n(.*?)\n---"
     match = re.search(yaml_pattern, content, re.DOTALL)
     if match:
+        import yaml  # deferred, like in markdown_parser
         try:
             return yaml.safe_load(match.group(1))
         except yaml.YAMLError:
@@ -119,14 +123,12 @@ def parse_markdown_template(md_content):
     2. Dictionary of tags
     3. Dictionary of content inside span
     """
-    # Remove any Windows line endings and clean content
-    md_content = md_content.replace('\r\n', '\n')
-    md_content = clean_content(md_content)
+    doc = parse_diary(md_content)
     
     result = {
-        'frontmatter': extract_yaml_frontmatter(md_content),
-        'span_data': extract_span_content(md_content),
-        'headers': extract_header_content(md_content)
+        'frontmatter': doc.frontmatter,
+        'span_data': doc.span_data,
+        'headers': doc.headers()
     }
     
     return result
@@ -163,6 +165,7 @@ def remove_template_content(content, template_content):
     
     # Add frontmatter
     if parsed_content['frontmatter']:
+        import yaml
         result.append('---')
         result.append(yaml.dump(parsed_content['frontmatter'], allow_unicode=True).strip())
         result.append('---\n')
@@ -184,29 +187,54 @@ def remove_template_content(content, template_content):
     
     return '\n'.join(result)
 
-def get_non_empty_headers_content(content, template_content=None):
+def strip_template_sections(doc: DiaryDocument, template_content) -> list:
     """
-    Return non-empty header content as a string, with symbols removed from headers.
-    Format: header: content; header2: content2
-    If template_content is provided, removes template content first.
+    Return (header, content) pairs of a parsed diary with the template's
+    predefined content removed from each header.
+    template_content may be the template text or a CompiledTemplate.
     """
-    if template_content:
-        content = remove_template_content(content, template_content)
+    if not template_content:
+        return [(section.title, section.content) for section in doc.sections]
+    if not isinstance(template_content, CompiledTemplate):
+        template_content = CompiledTemplate(template_content)
+    return template_content.strip(doc)
+
+def get_non_empty_sections(content, template_content=None):
+    """
+    Return (header, content) pairs of the non-empty sections, with symbols
+    removed from headers and whitespace collapsed in the content.
+    If template_content (text or CompiledTemplate) is provided, removes template content first.
+    """
+    with pipeline_metrics.span('parse'):
+        doc = parse_diary(content)
     
-    parsed_content = parse_markdown_template(content)
+    with pipeline_metrics.span('strip'):
+        sections = strip_template_sections(doc, template_content)
     
     # Remove emojis and symbols from headers and get non-empty content
     result_pairs = []
-    for header, content in parsed_content['headers'].items():
+    for header, content in sections:
         cleaned_content = content.strip()
         if cleaned_content:
             # Remove emojis and symbols from header
             clean_header = re.sub(r'[^\w\s]', '', header).strip()
             # Replace newlines with spaces and remove multiple spaces
             cleaned_content = re.sub(r'\s+', ' ', cleaned_content.replace('\n', ' '))
-            result_pairs.append(f"{clean_header}: {cleaned_content}")
+            result_pairs.append((clean_header, cleaned_content))
     
-    return "; ".join(result_pairs)
+    return result_pairs
+
+def format_sections(sections):
+    """Join (header, content) pairs as header: content; header2: content2"""
+    return "; ".join(f"{header}: {text}" for header, text in sections)
+
+def get_non_empty_headers_content(content, template_content=None):
+    """
+    Return non-empty header content as a string, with symbols removed from headers.
+    Format: header: content; header2: content2
+    If template_content (text or CompiledTemplate) is provided, removes template content first.
+    """
+    return format_sections(get_non_empty_sections(content, template_content))
 
 if __name__ == "__main__":
     # Use the diary folder from your Documents
@@ -0,0 +1,165 @@
+"""
+Pipeline instrumentation.
+
+Every stage of the summary pipeline (read, parse, strip, llm, write) records
+its duration into a histogram, and every model call records its token counts
+and load/eval times as reported by Ollama. The process-wide registry
+`pipeline_metrics` can be exported as JSON or in the Prometheus text format.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+METRIC_PREFIX = "obsidian_ai"
+
+_SECONDS_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+_TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+# name: (help text, label name, buckets)
+METRIC_DEFINITIONS = {
+    'stage_seconds': ("Time spent per pipeline stage", 'stage', _SECONDS_BUCKETS),
+    'llm_tokens': ("Tokens per model request", 'kind', _TOKEN_BUCKETS),
+    'llm_seconds': ("Model-side time per request as reported by Ollama", 'phase', _SECONDS_BUCKETS),
+}
+
+class Histogram:
+    """Cumulative-bucket histogram, as in Prometheus."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'buckets': {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+        }
+
+class PipelineMetrics:
+    """Thread-safe registry of histograms and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name: str, label: str, value: float):
+        """Record value in histogram name, e.g. observe('stage_seconds', 'read', 0.002)."""
+        with self._lock:
+            histogram = self.histograms.get((name, label))
+            if histogram is None:
+                histogram = self.histograms[(name, label)] = Histogram(METRIC_DEFINITIONS[name][2])
+            histogram.observe(value)
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self.counters.get(name, 0)
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time the enclosed block as one observation of stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            captured = getattr(self._local, 'captured', None)
+            if captured is not None:
+                captured.append((stage, elapsed))
+            else:
+                self.observe('stage_seconds', stage, elapsed)
+
+    @contextmanager
+    def capture(self):
+        """
+        Collect the (stage, seconds) of the spans run in this thread instead
+        of recording them, e.g. to record them in the parent of a worker
+        process with record_stages.
+        """
+        previous = getattr(self._local, 'captured', None)
+        captured = self._local.captured = []
+        try:
+            yield captured
+        finally:
+            self._local.captured = previous
+
+    def record_stages(self, stages):
+        """Record (stage, seconds) pairs collected by capture."""
+        for stage, seconds in stages:
+            self.observe('stage_seconds', stage, seconds)
+
+    def record_llm_response(self, response):
+        """
+        Record the token counts and durations Ollama returns with a response.
+        Missing fields (e.g. from other servers) are ignored.
+        """
+        self.increment('llm_requests_total')
+        for field, kind in (('prompt_eval_count', 'prompt'), ('eval_count', 'eval')):
+            value = response.get(field)
+            if value is not None:
+                self.observe('llm_tokens', kind, value)
+                self.increment(f'llm_{kind}_tokens_total', value)
+        for field, phase in (('load_duration', 'load'), ('prompt_eval_duration', 'prompt_eval'),
+                             ('eval_duration', 'eval'), ('total_duration', 'total')):
+            value = response.get(field)
+            if value is not None:
+                # Ollama reports durations in nanoseconds
+                self.observe('llm_seconds', phase, value / 1e9)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            histograms = {}
+            for (name, label), histogram in sorted(self.histograms.items()):
+                histograms.setdefault(name, {})[label] = histogram.to_dict()
+            return {'histograms': histograms, 'counters': dict(self.counters)}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, (help_text, label_name, _) in METRIC_DEFINITIONS.items():
+                series = sorted((label, h) for (n, label), h in self.histograms.items() if n == name)
+                if not series:
+                    continue
+                metric = f"{METRIC_PREFIX}_{name}"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for label, histogram in series:
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{metric}_bucket{{{label_name}="{label}",le="{bound}"}} {count}')
+                    lines.append(f'{metric}_bucket{{{label_name}="{label}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{metric}_sum{{{label_name}="{label}"}} {histogram.sum}')
+                    lines.append(f'{metric}_count{{{label_name}="{label}"}} {histogram.count}')
+            for name, value in sorted(self.counters.items()):
+                metric = f"{METRIC_PREFIX}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+pipeline_metrics = PipelineMetrics()
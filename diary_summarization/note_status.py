@@ -0,0 +1,40 @@
+"""
+Whether a note is waiting for a summary, from its raw text.
+
+Kept apart from diary_summary so that listing notes and parse workers can
+check a note without importing the summary pipeline.
+"""
+
+import re
+
+EMPTY_SPAN_PATTERN = re.compile(r'(<span[^>]*>)\s*(\n*)\s*(</span>)')
+
+def has_empty_span(diary_content: str) -> bool:
+    """True if the diary has an empty span tag waiting for a summary."""
+    return EMPTY_SPAN_PATTERN.search(diary_content) is not None
+
+def has_summary(diary_content: str) -> bool:
+    """
+    Check if the diary content has has_summary: true in its front matter.
+
+    Args:
+        diary_content (str): Content of the diary file
+
+    Returns:
+        bool: True if diary has has_summary: true in front matter, False otherwise
+    """
+    # Look for front matter between --- markers
+    front_matter_pattern = r'^---\n(.*?)\n---'
+    front_matter_match = re.search(front_matter_pattern, diary_content, re.DOTALL)
+
+    if front_matter_match:
+        front_matter = front_matter_match.group(1)
+        # Look for has_summary: true in front matter
+        has_summary_match = re.search(r'has_summary:\s*true', front_matter, re.IGNORECASE)
+        return bool(has_summary_match)
+
+    return False
+
+def needs_summary(diary_content: str) -> bool:
+    """True if the diary has an empty span and is not marked has_summary: true."""
+    return has_empty_span(diary_content) and not has_summary(diary_content)
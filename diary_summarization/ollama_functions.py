@@ -1,6 +1,48 @@
 
+import contextvars
+import json
 import re
-import ollama
+import threading
+from contextlib import contextmanager, nullcontext
+
+from diary_summarization.bounded_generation import (
+    GenerationPaused, SUMMARY_MAX_CHARS, bounded_chat, get_generation_limits,
+)
+from diary_summarization.llm_backends import get_llm_backend
+from diary_summarization.metrics import pipeline_metrics
+
+# Anything that changes the generated summary must be part of the summary
+# cache key, so bump SUMMARY_PROMPT_VERSION whenever the prompt changes.
+SUMMARY_MODEL = "qwen2.5:latest"
+SUMMARY_PROMPT_VERSION = 1
+SUMMARY_OPTIONS = {"temperature": 0.0}
+# Cap on generated tokens per summary; a summary is 50-100 characters
+SUMMARY_NUM_PREDICT = 512
+
+# Embedding model for semantic search; changing it rebuilds the index
+EMBED_MODEL = "nomic-embed-text"
+
+# Batched mode: how many diaries and roughly how many prompt tokens go into one request
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_BATCH_TOKEN_BUDGET = 2000
+
+BATCH_SUMMARY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summaries": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "summary": {"type": "string"}
+                },
+                "required": ["id", "summary"]
+            }
+        }
+    },
+    "required": ["summaries"]
+}
 
 def convert_md_to_string(md_file_path: str) -> str:
     """
@@ -64,6 +106,72 @@ def convert_md_to_string(md_file_path: str) -> str:
     except Exception as e:
         raise Exception(f"Error converting markdown file: {str(e)}")
 
+def summary_model_id() -> str:
+    """The summary model as it goes into cache keys, so switching backend or model misses the cache."""
+    return get_llm_backend(SUMMARY_MODEL).cache_id
+
+def summary_cache_options() -> dict:
+    """
+    Generation settings that go into summary cache keys: SUMMARY_OPTIONS, plus
+    the reply cap of a bounded run, whose cut replies differ from full ones.
+    """
+    if get_generation_limits() is None:
+        return SUMMARY_OPTIONS
+    return {**SUMMARY_OPTIONS, 'max_chars': SUMMARY_MAX_CHARS}
+
+_request_slots = contextvars.ContextVar('request_slots', default=None)
+
+@contextmanager
+def request_slots(max_requests: int):
+    """
+    Allow at most max_requests ollama_chat requests in flight while the
+    block runs, from this thread and from worker threads running functions
+    wrapped with run_in_context, however the callers fan out (e.g. chunks of
+    long diaries summarized inside each note's worker). A nested block keeps
+    the outer cap; other runs have their own.
+    
+    Args:
+        max_requests (int): Maximum number of concurrent requests
+    """
+    if _request_slots.get() is not None:
+        yield
+        return
+    token = _request_slots.set(threading.BoundedSemaphore(max(1, max_requests)))
+    try:
+        yield
+    finally:
+        _request_slots.reset(token)
+
+def ollama_chat(prompt: str, format=None, num_predict: int = None, max_chars: int = None) -> str:
+    """
+    Send one user prompt to the summary model, record its metrics and return the reply text.
+    Inside a bounded_generation block the reply is streamed and cut at max_chars,
+    with timeouts and retries; see bounded_generation. Inside a request_slots
+    block it waits for a free slot first.
+    """
+    backend = get_llm_backend(SUMMARY_MODEL)
+    limits = get_generation_limits()
+    with _request_slots.get() or nullcontext(), pipeline_metrics.span('llm'):
+        if limits is None:
+            response = backend.chat(prompt, format=format, options=SUMMARY_OPTIONS,
+                                    num_predict=num_predict or SUMMARY_NUM_PREDICT)
+        else:
+            response = bounded_chat(backend, prompt, limits, format=format, options=SUMMARY_OPTIONS,
+                                    num_predict=num_predict or SUMMARY_NUM_PREDICT, max_chars=max_chars)
+    pipeline_metrics.record_llm_response(response)
+    return response['content']
+
+def ollama_embed(texts: list[str]) -> list[list[float]]:
+    """Embed several texts in one request to the local embedding model."""
+    with pipeline_metrics.span('embed'):
+        return get_llm_backend(SUMMARY_MODEL).embed(texts, EMBED_MODEL)
+
+def warm_up_summary_model():
+    """Load the summary model before a bulk run so the first diary does not pay for it."""
+    limits = get_generation_limits()
+    with pipeline_metrics.span('warm_up'):
+        get_llm_backend(SUMMARY_MODEL).warm_up(limits.request_timeout if limits else None)
+
 def qwen2_summary(text: str) -> str:
     """
     Summarize the given text using Ollama's qwen2.5 model.
@@ -84,21 +192,138 @@ def qwen2_summary(text: str) -> str:
 总结："""
         
         # Call Ollama API
-        response = ollama.chat(
-            model="qwen2.5:latest",
-            messages=[{
-                "role": "user",
-                "content": prompt
-            }],
-            options={
-                "temperature": 0.0}
-        )
-        
-        return response['message']['content'].strip()
+        return ollama_chat(prompt, max_chars=SUMMARY_MAX_CHARS).strip()
         
+    except GenerationPaused:
+        raise
     except Exception as e:
         raise Exception(f"Error generating summary with Ollama: {str(e)}")
 
+def estimate_tokens(text: str) -> int:
+    """Rough token count: one per CJK character, one per four other characters."""
+    cjk = sum(1 for ch in text if '\u4e00' <= ch <= '\u9fff')
+    return cjk + (len(text) - cjk) // 4 + 1
+
+def pack_batches(texts: list[str], batch_size: int = DEFAULT_BATCH_SIZE,
+                 token_budget: int = DEFAULT_BATCH_TOKEN_BUDGET) -> list[list[int]]:
+    """
+    Group texts into batches of at most batch_size texts and about token_budget
+    prompt tokens. A text over the budget gets a batch of its own.
+    
+    Args:
+        texts (list[str]): Texts to summarize
+        batch_size (int): Maximum number of texts per batch
+        token_budget (int): Approximate prompt token budget per batch
+        
+    Returns:
+        list[list[int]]: Indexes into texts, one list per batch
+    """
+    batches = []
+    current, current_tokens = [], 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= batch_size or current_tokens + tokens > token_budget):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def qwen2_batch_summary(texts: list[str]) -> list[str]:
+    """
+    Summarize several diaries in one request, asking for JSON that follows
+    BATCH_SUMMARY_SCHEMA. The answer is used only if its ids are exactly
+    0..len(texts)-1, each once with a non-empty summary; otherwise the model
+    may have merged, skipped or renumbered diaries, so every diary is
+    summarized on its own instead.
+    
+    Args:
+        texts (list[str]): Text contents to summarize
+        
+    Returns:
+        list[str]: One summary per text, in the same order
+    """
+    if len(texts) == 1:
+        return [qwen2_summary(texts[0])]
+    
+    diaries = "\n\n".join(f"[日记 {i}]\n{text}" for i, text in enumerate(texts))
+    prompt = f"""请分别以第一人称概括下面每篇日记的内容，每篇 50-100字，保持原文的情感和核心信息。
+按 JSON 返回，summaries 中每一项的 id 是日记的编号：
+
+{diaries}"""
+    
+    try:
+        content = ollama_chat(prompt, format=BATCH_SUMMARY_SCHEMA, num_predict=SUMMARY_NUM_PREDICT * len(texts))
+        items = json.loads(content)['summaries']
+        ids = [item['id'] for item in items]
+        if (all(type(i) is int for i in ids) and sorted(ids) == list(range(len(texts)))
+                and all(isinstance(item['summary'], str) and item['summary'].strip() for item in items)):
+            summaries = {item['id']: item['summary'].strip() for item in items}
+            return [summaries[i] for i in range(len(texts))]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        # Malformed batch output: fall through and retry each diary on its own
+        pass
+    except GenerationPaused:
+        raise
+    except Exception as e:
+        raise Exception(f"Error generating batch summary with Ollama: {str(e)}")
+    
+    pipeline_metrics.increment('batch_retries_total')
+    return [qwen2_summary(text) for text in texts]
+
+def qwen2_partial_summary(text: str) -> str:
+    """Summarize one chunk of a long diary, keeping more detail than the final summary."""
+    try:
+        prompt = f"""下面是一篇长日记的一部分。请以第一人称概括这部分的内容，不超过 150字，保留关键事件和情绪：
+
+{text}
+
+概括："""
+        return ollama_chat(prompt).strip()
+    except GenerationPaused:
+        raise
+    except Exception as e:
+        raise Exception(f"Error generating chunk summary with Ollama: {str(e)}")
+
+def qwen2_reduce_summary(partial_summaries: list[str]) -> str:
+    """Merge the summaries of a long diary's chunks into one 50-100 character summary."""
+    try:
+        parts = "\n".join(f"- {summary}" for summary in partial_summaries)
+        prompt = f"""下面是同一篇日记各部分的概括。请把它们合并成一段以第一人称的总结 50-100字，保持原文的情感和核心信息：
+
+{parts}
+
+总结："""
+        return ollama_chat(prompt, max_chars=SUMMARY_MAX_CHARS).strip()
+    except GenerationPaused:
+        raise
+    except Exception as e:
+        raise Exception(f"Error merging chunk summaries with Ollama: {str(e)}")
+
+def qwen2_rollup_summary(entries: list[tuple[str, str]], period: str) -> str:
+    """
+    Summarize a period from existing summaries, never from raw diary text.
+    
+    Args:
+        entries (list[tuple[str, str]]): (label, summary) pairs, e.g. one per day or week
+        period (str): What the period is, e.g. "这一周" or "这个月"
+        
+    Returns:
+        str: Summary of the period
+    """
+    try:
+        lines = "\n".join(f"{label}: {summary}" for label, summary in entries)
+        prompt = f"""下面是我{period}的日记总结。请以第一人称概括{period}的经历和情绪变化 100-150字：
+
+{lines}
+
+总结："""
+        return ollama_chat(prompt).strip()
+    except Exception as e:
+        raise Exception(f"Error generating rollup summary with Ollama: {str(e)}")
+
 def summarize_diary_file(md_file_path: str) -> str:
     """
     Convert markdown file to text and generate a summary.
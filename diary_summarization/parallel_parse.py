@@ -0,0 +1,157 @@
+"""
+Multi-core parse stage for large and nested vaults.
+
+parse_vault streams note paths from scan_notes (recursively by default), or
+the paths a caller found changed, to a process pool in chunks, and yields one
+compact ParsedNote per note: the cleaned text, or whatever the caller's
+extract function takes from the note, and the few fields callers need, never
+the whole document. At most a fixed number of chunks is in flight, so memory
+stays bounded no matter how many notes the vault has, and a handful of notes
+is parsed in this process rather than starting a pool.
+
+Workers are started with forkserver (spawn where there is none), never
+forked from the caller, which may be running threads that hold locks. The
+read, parse and strip timings of each note travel back with its ParsedNote
+and are recorded in the caller's pipeline_metrics.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import NamedTuple
+
+from diary_summarization.compiled_template import load_template
+from diary_summarization.markdown_parser import parse_diary
+from diary_summarization.metrics import pipeline_metrics
+from diary_summarization.md_helper_functions import get_non_empty_headers_content, get_non_empty_sections
+from diary_summarization.note_status import needs_summary
+from diary_summarization.vault_manifest import content_hash, scan_notes
+
+DEFAULT_CHUNK_SIZE = 64
+# Chunks queued per worker; enough to keep every core busy between results
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+class ParsedNote(NamedTuple):
+    """What the pipeline needs from a note, small enough to pickle cheaply."""
+    path: str
+    size: int
+    mtime_ns: int
+    hash: str
+    date: str
+    needs_summary: bool
+    text: str
+    error: str = None
+    data: object = None
+    stages: tuple = ()
+
+def note_sections(path: str, content: str, template) -> list:
+    """extract function for indexes: the note's (header, content) sections, see get_non_empty_sections."""
+    return get_non_empty_sections(content, template)
+
+_worker_template = None
+_worker_extract = None
+
+def _init_worker(template_path: str, extract=None):
+    global _worker_template, _worker_extract
+    # Compiled once per process instead of once per note
+    _worker_template = load_template(template_path) if template_path else None
+    _worker_extract = extract
+
+def parse_note(path: str, template=None, extract=None) -> ParsedNote:
+    """
+    Read and parse one note.
+
+    Args:
+        path (str): Path of the note
+        template: CompiledTemplate whose boilerplate is removed from the text, if any
+        extract (callable): Called as extract(path, content, template); its result
+            goes into data, in place of the cleaned text
+
+    Returns:
+        ParsedNote: The note's compact parse result; read errors are reported in error.
+            Its stages are not recorded yet, see parse_vault
+    """
+    with pipeline_metrics.capture() as stages:
+        try:
+            stat = os.stat(path)
+            with pipeline_metrics.span('read'):
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            with pipeline_metrics.span('parse'):
+                doc = parse_diary(content)
+            note = ParsedNote(
+                path=path,
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                hash=content_hash(content),
+                date=doc.span_data.get('date', '').strip(),
+                needs_summary=needs_summary(content),
+                text=get_non_empty_headers_content(content, template) if extract is None else '',
+                data=extract(path, content, template) if extract is not None else None,
+            )
+        except Exception as e:
+            note = ParsedNote(path, 0, 0, None, '', False, '', str(e))
+    return note._replace(stages=tuple(stages))
+
+def _pool_context():
+    # Forking a process whose other threads hold a lock (e.g. the metrics
+    # lock) would leave that lock held forever in the child
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+def _parse_chunk(paths: list[str]) -> list[ParsedNote]:
+    return [parse_note(path, _worker_template, _worker_extract) for path in paths]
+
+def parse_vault(diary_folder: str, template_path: str = None, recursive: bool = True,
+                workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE, paths=None, extract=None):
+    """
+    Parse every note of a vault on all cores, yielding results as chunks finish.
+
+    Args:
+        diary_folder (str): Path to the vault
+        template_path (str): Diary template whose boilerplate is removed from the text
+        recursive (bool): Include notes in subfolders
+        workers (int): Worker processes, by default one per core; 1 parses in this process
+        chunk_size (int): Notes per task sent to a worker
+        paths: Iterable of note paths to parse instead of scanning the folder
+        extract (callable): Module-level function, so workers can unpickle it, called as
+            extract(path, content, template) for each note; see parse_note
+
+    Yields:
+        ParsedNote: One per note, in completion order; its stage timings are
+            recorded in pipeline_metrics as it is yielded
+    """
+    workers = workers or os.cpu_count() or 1
+    if paths is None:
+        paths = (path for path, _ in scan_notes(diary_folder, recursive))
+    elif hasattr(paths, '__len__'):
+        # No more workers than chunks; one chunk is parsed here without a pool
+        workers = min(workers, -(-len(paths) // chunk_size))
+    paths = iter(paths)
+
+    if workers <= 1:
+        template = load_template(template_path) if template_path else None
+        for path in paths:
+            note = parse_note(path, template, extract)
+            pipeline_metrics.record_stages(note.stages)
+            yield note
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(), initializer=_init_worker,
+                             initargs=(template_path, extract)) as executor:
+        in_flight = set()
+        max_in_flight = workers * CHUNKS_IN_FLIGHT_PER_WORKER
+        while True:
+            while len(in_flight) < max_in_flight:
+                chunk = list(islice(paths, chunk_size))
+                if not chunk:
+                    break
+                in_flight.add(executor.submit(_parse_chunk, chunk))
+            if not in_flight:
+                return
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                for note in future.result():
+                    pipeline_metrics.record_stages(note.stages)
+                    yield note
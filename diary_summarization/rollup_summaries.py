@@ -0,0 +1,161 @@
+"""
+Weekly and monthly rollup notes.
+
+Rollups are built only from the daily summaries already written into each
+diary's timeline span, grouped by the span's data-date: an ISO week from
+its days, and a calendar month from its own days, so a week that straddles
+two months counts towards both. Per-note and per-period fingerprints are
+kept in the vault's hidden folder, so one edited day only recomputes its
+week and its month.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+
+from diary_summarization.atomic_write import atomic_write_text
+from diary_summarization.markdown_parser import parse_diary
+from diary_summarization.ollama_functions import qwen2_rollup_summary
+from diary_summarization.vault_manifest import scan_changes
+from diary_summarization.vault_state import state_path
+
+ROLLUP_STATE_FILENAME = "rollups.json"
+ROLLUP_FOLDER_NAME = "rollups"
+
+def _load_state(path: str) -> dict:
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {'notes': {}, 'periods': {}}
+
+def _fingerprint(entries: list) -> str:
+    return hashlib.sha256(json.dumps(entries, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def read_daily_summary(diary_path: str):
+    """Return (date, summary) from a diary's timeline span, or None if it has no dated summary."""
+    with open(diary_path, 'r', encoding='utf-8') as f:
+        doc = parse_diary(f.read())
+    try:
+        date = datetime.date.fromisoformat(doc.span_data.get('date', '').strip())
+    except ValueError:
+        return None
+    if not doc.span_body:
+        return None
+    return date.isoformat(), doc.span_body
+
+def week_key(date: datetime.date) -> str:
+    year, week, _ = date.isocalendar()
+    return f"{year}-W{week:02d}"
+
+def week_bounds(key: str) -> tuple[str, str]:
+    """Monday and Sunday of a week key such as "2024-W09"."""
+    year, week = (int(part) for part in key.split('-W'))
+    return (datetime.date.fromisocalendar(year, week, 1).isoformat(),
+            datetime.date.fromisocalendar(year, week, 7).isoformat())
+
+def month_key(date: datetime.date) -> str:
+    return f"{date.year}-{date.month:02d}"
+
+def month_bounds(key: str) -> tuple[str, str]:
+    """First and last day of a month key such as "2024-02"."""
+    year, month = (int(part) for part in key.split('-'))
+    first = datetime.date(year, month, 1)
+    next_month = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return first.isoformat(), (next_month - datetime.timedelta(days=1)).isoformat()
+
+def _rollup_note(kind: str, key: str, summary: str, entries: list, start: str, end: str) -> str:
+    lines = [
+        "---",
+        "tags:",
+        "  - rollup",
+        f"rollup: {kind}",
+        f"period: {key}",
+        "---",
+        f"<span class='ob-timelines' data-date='{start}' data-title='{key}' "
+        f"data-class='blue' data-type='range' data-end='{end}'>",
+        f"\t\t{summary}",
+        "</span>",
+        "# Summaries",
+    ]
+    lines += [f"- {label}: {text}" for label, text in entries]
+    return "\n".join(lines) + "\n"
+
+def update_rollups(diary_folder: str, rollup_folder: str = None) -> tuple[bool, str]:
+    """
+    Bring the weekly and monthly rollup notes up to date.
+    
+    Args:
+        diary_folder (str): Path to the folder containing diary entries
+        rollup_folder (str): Where rollup notes go, by default <diary_folder>/rollups
+        
+    Returns:
+        tuple[bool, str]: Success status and message
+    """
+    try:
+        if not os.path.exists(diary_folder):
+            return False, "Diary folder does not exist"
+        rollup_folder = rollup_folder or os.path.join(diary_folder, ROLLUP_FOLDER_NAME)
+        state_file = state_path(diary_folder, ROLLUP_STATE_FILENAME)
+        state = _load_state(state_file)
+        
+        # Re-read only the notes that changed since the last rollup
+        known = {name: (entry['size'], entry['mtime_ns']) for name, entry in state['notes'].items()}
+        changed, removed = scan_changes(diary_folder, known, key=os.path.basename)
+        removed = set(removed)
+        notes = {name: entry for name, entry in state['notes'].items() if name not in removed}
+        for path in changed:
+            stat = os.stat(path)
+            daily = read_daily_summary(path)
+            notes[os.path.basename(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                             'date': daily[0] if daily else None,
+                                             'summary': daily[1] if daily else None}
+        state['notes'] = notes
+        
+        weeks = {}
+        months = {}
+        for entry in notes.values():
+            if entry['date']:
+                date = datetime.date.fromisoformat(entry['date'])
+                weeks.setdefault(week_key(date), []).append((entry['date'], entry['summary']))
+                months.setdefault(month_key(date), []).append((entry['date'], entry['summary']))
+        
+        periods = {}
+        updated = []
+        
+        def refresh(kind, key, entries, period, start, end):
+            entries = sorted(entries)
+            fingerprint = _fingerprint(entries)
+            previous = state['periods'].get(f"{kind}/{key}")
+            path = os.path.join(rollup_folder, kind, f"{key}.md")
+            if previous and previous['fingerprint'] == fingerprint and os.path.exists(path):
+                periods[f"{kind}/{key}"] = previous
+                return
+            summary = qwen2_rollup_summary(entries, period)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write_text(path, _rollup_note(kind, key, summary, entries, start, end))
+            periods[f"{kind}/{key}"] = {'fingerprint': fingerprint, 'summary': summary}
+            updated.append(f"{kind}/{key}")
+        
+        for key in sorted(weeks):
+            refresh('weekly', key, weeks[key], "这一周", *week_bounds(key))
+        for key in sorted(months):
+            refresh('monthly', key, months[key], "这个月", *month_bounds(key))
+        
+        # Rollups of periods that no longer have any summarized day
+        for stale in set(state['periods']) - set(periods):
+            stale_path = os.path.join(rollup_folder, f"{stale}.md")
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+        
+        state['periods'] = periods
+        atomic_write_text(state_file, json.dumps(state, ensure_ascii=False))
+        
+        return True, (f"Updated {len(updated)} rollups "
+                      f"({len(weeks)} weeks, {len(months)} months, {len(periods) - len(updated)} unchanged)")
+    
+    except Exception as e:
+        return False, f"Error updating rollups: {str(e)}"
@@ -0,0 +1,99 @@
+"""
+Ordering and budgets for summarization runs.
+
+A run works on the notes edited recently first, newest first, so the diary
+written this morning is summarized before a meeting starts; the remaining
+backlog follows oldest first, so repeated short runs work through it in
+order. A RunBudget stops a run from starting new notes once its wall-clock
+or token budget is spent. Notes it never started are reported as
+'deferred', stay out of the manifest, and are picked up by the next run.
+"""
+
+import os
+import time
+
+from diary_summarization.metrics import pipeline_metrics
+
+# Notes modified within this many days count as recent
+RECENT_DAYS = 7
+REPORT_MAX_FILES = 10
+
+def prioritize_diary_files(paths: list[str], recent_days: float = RECENT_DAYS, now: float = None) -> list[str]:
+    """
+    Order notes for a run: recently modified ones newest first, then the rest oldest first.
+
+    Args:
+        paths (list[str]): Note paths
+        recent_days (float): How far back "recently modified" reaches
+        now (float): Current time as a timestamp, by default time.time()
+
+    Returns:
+        list[str]: The same paths in processing order
+    """
+    now = time.time() if now is None else now
+    cutoff = now - recent_days * 86400
+    mtimes = {}
+    for path in paths:
+        try:
+            mtimes[path] = os.stat(path).st_mtime
+        except OSError:
+            mtimes[path] = 0.0
+    recent = sorted((p for p in paths if mtimes[p] >= cutoff), key=mtimes.get, reverse=True)
+    backlog = sorted((p for p in paths if mtimes[p] < cutoff), key=mtimes.get)
+    return recent + backlog
+
+def _tokens_used() -> float:
+    return pipeline_metrics.counter('llm_prompt_tokens_total') + pipeline_metrics.counter('llm_eval_tokens_total')
+
+class RunBudget:
+    """
+    Wall-clock and/or token budget of one run. Checked before each note or
+    batch is started, so requests already in flight can overshoot it by at
+    most max_workers requests.
+    """
+
+    def __init__(self, seconds: float = None, tokens: int = None):
+        """
+        Args:
+            seconds (float): Stop starting new work this many seconds from now
+            tokens (int): Stop starting new work once this many prompt and
+                generated tokens were used
+        """
+        self.deadline = time.monotonic() + seconds if seconds is not None else None
+        self.tokens = tokens
+        self._tokens_at_start = _tokens_used()
+
+    def exhausted(self) -> bool:
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return True
+        return self.tokens is not None and _tokens_used() - self._tokens_at_start >= self.tokens
+
+def estimate_seconds_left(results: list[dict], elapsed: float) -> float:
+    """
+    Time the deferred notes would take at this run's pace (wall time per
+    summarized note, which already reflects workers and batching), or None
+    when nothing was summarized to measure it.
+    """
+    summarized = sum(1 for result in results if result['status'] == 'updated')
+    deferred = sum(1 for result in results if result['status'] == 'deferred')
+    if not summarized or elapsed is None:
+        return None
+    return elapsed / summarized * deferred
+
+def format_remaining(results: list[dict], elapsed: float = None, stop_reason: str = "the run budget") -> list[str]:
+    """Report lines for the notes a budget (or a paused run) left for the next run."""
+    deferred = [result['path'] for result in results if result['status'] == 'deferred']
+    if not deferred:
+        return []
+    eta = estimate_seconds_left(results, elapsed)
+    if eta is None:
+        eta_text = "time to finish unknown"
+    elif eta < 120:
+        eta_text = f"about {eta:.0f} s to finish"
+    else:
+        eta_text = f"about {eta / 60:.0f} min to finish"
+    lines = [f"Stopped at {stop_reason}: {len(deferred)} diaries left for the next run ({eta_text})"]
+    lines += [f"- {os.path.basename(path)}" for path in deferred[:REPORT_MAX_FILES]]
+    if len(deferred) > REPORT_MAX_FILES:
+        lines.append(f"- ... and {len(deferred) - REPORT_MAX_FILES} more")
+    return lines
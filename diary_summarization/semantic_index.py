@@ -0,0 +1,282 @@
+"""
+Semantic search over the vault's diary sections.
+
+Every non-empty section (as cleaned by get_non_empty_sections) is embedded
+and stored as a normalized float32 row of a memory-mapped .npy matrix in the
+vault's hidden folder; a SQLite table next to it says which note and header
+each row belongs to. Changed notes tombstone their old rows and append new
+ones, so an update writes only the rows of the notes it touched, and queries
+are a single matrix-vector product over the mapped rows.
+"""
+
+import os
+import sqlite3
+import threading
+import zlib
+
+import numpy as np
+
+from diary_summarization.fulltext_index import tokenize
+from diary_summarization.ollama_functions import EMBED_MODEL, ollama_embed
+from diary_summarization.parallel_parse import note_sections, parse_vault
+from diary_summarization.vault_manifest import scan_changes
+from diary_summarization.vault_state import state_path
+
+INDEX_MATRIX_FILENAME = "semantic_index.npy"
+INDEX_DB_FILENAME = "semantic_index.sqlite"
+EMBED_BATCH_SIZE = 64
+PREVIEW_CHARS = 120
+HASHING_DIM = 256
+
+def hashing_embed(texts: list[str], dim: int = HASHING_DIM) -> np.ndarray:
+    """
+    Deterministic stand-in for an embedding model: signed feature hashing of
+    Latin words and CJK character bigrams. Needs no server, so it works for
+    benchmarks and offline vaults, at the price of matching words rather
+    than meaning.
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for token in tokenize(text):
+            h = zlib.crc32(token.encode('utf-8'))
+            vectors[row, h % dim] += 1.0 if h & 0x80000000 else -1.0
+    return vectors
+
+def ollama_embedder(texts: list[str]) -> np.ndarray:
+    """Embed texts with the local Ollama embedding model."""
+    return np.asarray(ollama_embed(texts), dtype=np.float32)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+class SemanticIndex:
+    """Memory-mapped embedding matrix plus a SQLite map of its rows."""
+
+    def __init__(self, matrix_path: str, db_path: str, embed=ollama_embedder, model: str = EMBED_MODEL):
+        """
+        Args:
+            matrix_path (str): Path of the .npy embedding matrix
+            db_path (str): Path of the SQLite row map
+            embed: Callable turning a list of texts into a 2-D float array
+            model (str): Name of the embedding model; a different name than
+                the stored one discards the index
+        """
+        self.matrix_path = matrix_path
+        self.db_path = db_path
+        self.embed = embed
+        self.model = model
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._live = None
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS notes (
+                path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS rows (
+                id INTEGER PRIMARY KEY, path TEXT NOT NULL, header TEXT NOT NULL, preview TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS rows_path ON rows(path);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value NOT NULL);
+        """)
+        if self._meta('model') != model or not os.path.exists(matrix_path):
+            # New, or built with another model: start over
+            with self._conn:
+                self._conn.execute("DELETE FROM notes")
+                self._conn.execute("DELETE FROM rows")
+                self._conn.execute("DELETE FROM meta")
+                self._set_meta('model', model)
+                self._set_meta('count', 0)
+
+    @classmethod
+    def for_vault(cls, diary_folder: str, embed=ollama_embedder, model: str = EMBED_MODEL) -> "SemanticIndex":
+        """Open the index stored in the vault's hidden folder."""
+        return cls(state_path(diary_folder, INDEX_MATRIX_FILENAME),
+                   state_path(diary_folder, INDEX_DB_FILENAME), embed, model)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _meta(self, key: str, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def count(self) -> int:
+        """Rows written to the matrix, live or tombstoned; rows past it are ignored."""
+        return self._meta('count', 0)
+
+    @property
+    def live_rows(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def _open_matrix(self, mode: str = 'r'):
+        return np.load(self.matrix_path, mmap_mode=mode)
+
+    def _reserve(self, extra: int, dim: int):
+        """Make room for extra rows, doubling the matrix file when it is full."""
+        count = self.count
+        capacity = 0
+        if self._meta('dim') is not None and os.path.exists(self.matrix_path):
+            capacity = self._open_matrix().shape[0]
+        if count + extra <= capacity:
+            return
+        new_capacity = max(2 * capacity, count + extra, 1024)
+        tmp_path = self.matrix_path + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(new_capacity, dim))
+        if count:
+            grown[:count] = self._open_matrix()[:count]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self.matrix_path)
+        self._set_meta('dim', dim)
+
+    def add(self, note: str, sections: list[tuple[str, str]], vectors: np.ndarray, size: int = 0, mtime_ns: int = 0):
+        """
+        Append the embedded sections of a note, replacing its previous rows.
+        Takes effect on disk at the next save.
+
+        Args:
+            note (str): Note path relative to the vault
+            sections (list[tuple[str, str]]): (header, text) pairs
+            vectors (np.ndarray): One embedding per section
+            size (int): Size of the note when it was read
+            mtime_ns (int): Modification time of the note when it was read
+        """
+        self.remove(note)
+        if len(sections):
+            vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+            self._reserve(len(sections), vectors.shape[1])
+            start = self.count
+            matrix = self._open_matrix('r+')
+            matrix[start:start + len(sections)] = vectors
+            matrix.flush()
+            del matrix
+            self._conn.executemany("INSERT INTO rows (id, path, header, preview) VALUES (?, ?, ?, ?)",
+                                   [(start + i, note, header, text[:PREVIEW_CHARS])
+                                    for i, (header, text) in enumerate(sections)])
+            self._set_meta('count', start + len(sections))
+        self._conn.execute("INSERT INTO notes (path, size, mtime_ns) VALUES (?, ?, ?)", (note, size, mtime_ns))
+        self._matrix = None
+
+    def remove(self, note: str):
+        """Tombstone the rows of a note."""
+        self._conn.execute("DELETE FROM rows WHERE path = ?", (note,))
+        self._conn.execute("DELETE FROM notes WHERE path = ?", (note,))
+        self._matrix = None
+
+    def compact(self):
+        """Rewrite the matrix without tombstoned rows."""
+        live = [row[0] for row in self._conn.execute("SELECT id FROM rows ORDER BY id")]
+        if len(live) == self.count:
+            return
+        tmp_path = self.matrix_path + ".tmp"
+        compacted = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                              shape=(max(len(live), 1), self._meta('dim')))
+        if live:
+            compacted[:len(live)] = self._open_matrix()[live]
+        compacted.flush()
+        del compacted
+        os.replace(tmp_path, self.matrix_path)
+        # Ascending, so a row never moves onto one that is still to be moved
+        self._conn.executemany("UPDATE rows SET id = ? WHERE id = ?",
+                               [(new, old) for new, old in enumerate(live) if new != old])
+        self._set_meta('count', len(live))
+        self._conn.commit()
+        self._matrix = None
+
+    def save(self):
+        """Commit the row map; matrix rows past its count are ignored on the next open."""
+        dead = self.count - self.live_rows
+        if dead > 1000 and dead > self.count // 2:
+            self.compact()
+        self._conn.commit()
+
+    def update(self, diary_folder: str, template_path: str = None, recursive: bool = False) -> dict:
+        """
+        Re-embed the notes whose size or mtime changed and drop deleted ones.
+
+        Args:
+            diary_folder (str): Path to the vault
+            template_path (str): Diary template whose boilerplate is not indexed
+            recursive (bool): Also index notes in subfolders
+
+        Returns:
+            dict: Number of notes embedded and removed, and sections indexed
+        """
+        with self._lock:
+            known = {path: (size, mtime_ns) for path, size, mtime_ns
+                     in self._conn.execute("SELECT path, size, mtime_ns FROM notes")}
+            changed, removed = scan_changes(diary_folder, known, recursive)
+            for note in removed:
+                self.remove(note)
+
+            embedded = 0
+            for parsed in parse_vault(diary_folder, template_path, paths=changed, extract=note_sections):
+                if parsed.error is not None:
+                    print(f"Error indexing {parsed.path}: {parsed.error}")
+                    continue
+                sections = parsed.data
+                texts = [f"{header}: {text}" for header, text in sections]
+                vectors = [self.embed(texts[i:i + EMBED_BATCH_SIZE]) for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+                self.add(os.path.relpath(parsed.path, diary_folder), sections,
+                         np.concatenate(vectors) if vectors else [], parsed.size, parsed.mtime_ns)
+                embedded += 1
+
+            if embedded or removed:
+                self.save()
+            return {'embedded': embedded, 'removed': len(removed), 'sections': self.live_rows}
+
+    def _load_matrix(self):
+        if self._matrix is None:
+            count = self.count
+            if count == 0:
+                return None, None
+            self._matrix = self._open_matrix()[:count]
+            self._live = np.zeros(count, dtype=bool)
+            self._live[np.fromiter((row[0] for row in self._conn.execute("SELECT id FROM rows")), dtype=np.int64)] = True
+        return self._matrix, self._live
+
+    def search(self, query: str, k: int = 10) -> list[dict]:
+        """
+        Return the k sections most similar to the query.
+
+        Args:
+            query (str): Free text to search for
+            k (int): Number of results
+
+        Returns:
+            list[dict]: Results with note, header, preview and cosine score, best first
+        """
+        with self._lock:
+            matrix, live = self._load_matrix()
+            if matrix is None:
+                return []
+            q = _normalize(np.asarray(self.embed([query]), dtype=np.float32))[0]
+            scores = matrix @ q
+            scores[~live] = -np.inf
+            k = min(k, int(live.sum()))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            rows = {row[0]: row[1:] for row in self._conn.execute(
+                f"SELECT id, path, header, preview FROM rows WHERE id IN ({','.join('?' * len(top))})",
+                [int(row) for row in top])}
+            results = []
+            for row in top:
+                note, header, preview = rows[int(row)]
+                results.append({'note': note, 'header': header, 'preview': preview, 'score': float(scores[row])})
+            return results
@@ -0,0 +1,45 @@
+"""
+Registry of summarizer backends.
+
+A backend is registered by the dotted path of a function that summarizes a
+vault and returns (success, message). Nothing is imported until the backend
+is used, so listing backends, or any command that does not summarize, never
+loads an LLM client library.
+"""
+
+import importlib
+import sys
+
+_SUMMARIZERS = {}
+
+def register_summarizer(name: str, target: str, description: str):
+    """
+    Register a summarizer backend.
+    
+    Args:
+        name (str): Name used to select the backend
+        target (str): "module:function" of a function taking the diary folder
+            and keyword options and returning tuple[bool, str]
+        description (str): One line shown by list_summarizers
+    """
+    _SUMMARIZERS[name] = (target, description)
+
+def list_summarizers() -> list[dict]:
+    """Registered backends with their description and whether their module is loaded yet."""
+    return [{
+        'name': name,
+        'description': description,
+        'loaded': target.split(':')[0] in sys.modules,
+    } for name, (target, description) in _SUMMARIZERS.items()]
+
+def load_summarizer(name: str):
+    """Import a backend's module and return its summarize function."""
+    if name not in _SUMMARIZERS:
+        raise ValueError(f"Unknown summarizer '{name}', expected one of: {', '.join(_SUMMARIZERS)}")
+    module_name, function_name = _SUMMARIZERS[name][0].split(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+register_summarizer('ollama', 'diary_summarization.diary_summary:update_diary_summaries',
+                    "Local Ollama model, writes summaries into the notes' timeline spans")
+register_summarizer('crewai', 'diary_summarization.fixed_diary_summarization:run_diary_processor',
+                    "crewAI agents on OpenAI, prints the formatted summaries")
@@ -0,0 +1,114 @@
+"""
+Persistent summary cache.
+
+Summaries are stored in SQLite under the vault's hidden folder and keyed by a
+hash of the cleaned diary text together with the model, prompt version and
+options, so an unchanged diary never goes back to the model.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from diary_summarization.vault_state import state_path
+
+CACHE_FILENAME = "summary_cache.sqlite"
+DEFAULT_MAX_ENTRIES = 20000
+DEFAULT_MAX_AGE_DAYS = 365
+
+def make_cache_key(text: str, model: str, prompt_version: int, options: dict) -> str:
+    """Hash the cleaned text and everything else that shapes the summary."""
+    payload = json.dumps(
+        {'text': text, 'model': model, 'prompt_version': prompt_version, 'options': options},
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class SummaryCache:
+    """
+    SQLite-backed cache from key to summary, with size and age based eviction.
+    Safe to share between worker threads.
+    """
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            " key TEXT PRIMARY KEY,"
+            " summary TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used)")
+        self._conn.commit()
+
+    @classmethod
+    def for_vault(cls, diary_folder: str, **kwargs) -> "SummaryCache":
+        """Open the cache stored in the vault's hidden folder."""
+        return cls(state_path(diary_folder, CACHE_FILENAME), **kwargs)
+
+    def get(self, key: str):
+        """Return the cached summary for key, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, summary: str):
+        """Store summary under key."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, summary, now, now),
+            )
+            self._conn.commit()
+
+    def evict(self) -> int:
+        """
+        Drop entries unused for longer than max_age_days, then the least
+        recently used ones beyond max_entries.
+        
+        Returns:
+            int: Number of entries removed
+        """
+        with self._lock:
+            cutoff = time.time() - self.max_age_seconds
+            removed = self._conn.execute("DELETE FROM summaries WHERE last_used < ?", (cutoff,)).rowcount
+            removed += self._conn.execute(
+                "DELETE FROM summaries WHERE key NOT IN "
+                "(SELECT key FROM summaries ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            ).rowcount
+            self._conn.commit()
+            return removed
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this session and the number of stored entries."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,205 @@
+"""
+Background summary jobs.
+
+Jobs and the state of every file in them are kept in SQLite under the
+vault's hidden folder, and a single worker thread runs them. Each finished
+file is checkpointed as soon as it is written, so a job interrupted by a
+crash or restart resumes with the files it had not finished yet.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+from diary_summarization.diary_summary import update_diary_summaries
+from diary_summarization.vault_manifest import VaultManifest
+from diary_summarization.vault_state import state_path
+
+JOBS_FILENAME = "jobs.sqlite"
+
+# File states that need no more work when a job resumes
+FINISHED_FILE_STATES = ('written', 'skipped')
+
+class JobStore:
+    """Persisted job queue. Every call opens its own connection, so any thread may use it."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " folder TEXT NOT NULL,"
+                " options TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " message TEXT,"
+                " created REAL NOT NULL,"
+                " started REAL,"
+                " finished REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_files ("
+                " job_id INTEGER NOT NULL,"
+                " path TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " seconds REAL,"
+                " error TEXT,"
+                " PRIMARY KEY (job_id, path))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def create_job(self, folder: str, files: list[str], options: dict) -> int:
+        with self._connect() as conn:
+            job_id = conn.execute(
+                "INSERT INTO jobs (folder, options, status, created) VALUES (?, ?, 'queued', ?)",
+                (folder, json.dumps(options), time.time()),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO job_files (job_id, path, status) VALUES (?, ?, 'queued')",
+                [(job_id, path) for path in files],
+            )
+        return job_id
+
+    def active_job(self):
+        """The running or oldest queued job, or None."""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('running', 'queued') "
+                "ORDER BY status = 'running' DESC, id LIMIT 1"
+            ).fetchone()
+        return dict(row) if row else None
+
+    def latest_job(self):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT 1").fetchone()
+        return dict(row) if row else None
+
+    def get_job(self, job_id: int):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def set_job_status(self, job_id: int, status: str, message: str = None):
+        column = {'running': 'started', 'done': 'finished', 'failed': 'finished'}.get(status)
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, message = COALESCE(?, message) WHERE id = ?",
+                         (status, message, job_id))
+            if column:
+                conn.execute(f"UPDATE jobs SET {column} = ? WHERE id = ?", (time.time(), job_id))
+
+    def unfinished_files(self, job_id: int) -> list[str]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT path FROM job_files WHERE job_id = ? AND status NOT IN (?, ?) ORDER BY rowid",
+                (job_id, *FINISHED_FILE_STATES),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def set_file_status(self, job_id: int, path: str, status: str, seconds: float = None, error: str = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE job_files SET status = ?, seconds = COALESCE(?, seconds), error = ? "
+                "WHERE job_id = ? AND path = ?",
+                (status, seconds, error, job_id, path),
+            )
+
+    def job_files(self, job_id: int) -> list[dict]:
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                "SELECT path, status, seconds, error FROM job_files WHERE job_id = ? ORDER BY rowid",
+                (job_id,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+class JobRunner:
+    """
+    Runs the summary jobs of one vault on a daemon thread.
+    Jobs left 'running' by a previous process are resumed on start.
+    """
+
+    def __init__(self, diary_folder: str):
+        self.diary_folder = diary_folder
+        self.store = JobStore(state_path(diary_folder, JOBS_FILENAME))
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="summary-jobs", daemon=True)
+        self._thread.start()
+
+    def submit(self, **options) -> int:
+        """
+        Queue a summary update of the vault, unless one is already queued or
+        running, in which case that job's id is returned.
+        
+        Args:
+            **options: Passed on to update_diary_summaries, e.g. max_workers
+            
+        Returns:
+            int: Job id
+        """
+        active = self.store.active_job()
+        if active is not None:
+            return active['id']
+        
+        files = VaultManifest.for_vault(self.diary_folder).changed_files(self.diary_folder,
+                                                                         options.get('recursive', False))
+        job_id = self.store.create_job(self.diary_folder, files, options)
+        self._wake.set()
+        return job_id
+
+    def status(self, job_id: int = None) -> dict:
+        """
+        Status of a job (the latest one by default), with per-status file counts.
+        
+        Returns:
+            dict: The job row plus 'files' and 'counts', or None if there are no jobs
+        """
+        job = self.store.latest_job() if job_id is None else self.store.get_job(job_id)
+        if job is None:
+            return None
+        
+        job['files'] = self.store.job_files(job['id'])
+        job['counts'] = {}
+        for file in job['files']:
+            job['counts'][file['status']] = job['counts'].get(file['status'], 0) + 1
+        return job
+
+    def _run(self):
+        while True:
+            job = self.store.active_job()
+            if job is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            self._run_job(job)
+
+    def _run_job(self, job: dict):
+        job_id = job['id']
+        self.store.set_job_status(job_id, 'running')
+        
+        def checkpoint(event):
+            if event['path'] is None:
+                return
+            if event['event'] in ('written', 'skipped', 'failed', 'deferred'):
+                self.store.set_file_status(job_id, event['path'], event['event'],
+                                           event.get('seconds'), event.get('error'))
+            elif event['event'] in ('cache_hit', 'summarizing'):
+                self.store.set_file_status(job_id, event['path'], event['event'])
+        
+        try:
+            files = self.store.unfinished_files(job_id)
+            if files:
+                success, message = update_diary_summaries(
+                    job['folder'], on_event=checkpoint, diary_files=files, **json.loads(job['options'])
+                )
+            else:
+                success, message = True, "All diary summaries are up to date"
+            self.store.set_job_status(job_id, 'done' if success else 'failed', message)
+        except Exception as e:
+            self.store.set_job_status(job_id, 'failed', f"Error running summary job: {str(e)}")
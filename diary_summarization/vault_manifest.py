@@ -0,0 +1,137 @@
+"""
+Incremental vault manifest.
+
+Remembers size, mtime_ns and a content hash for every note that was
+processed, so a run only has to stat the folder and open the notes that are
+new or were modified since the last run.
+"""
+
+import hashlib
+import json
+import os
+
+from diary_summarization.atomic_write import atomic_write_text
+from diary_summarization.vault_state import state_path
+
+MANIFEST_FILENAME = "manifest.json"
+
+def content_hash(content: str) -> str:
+    """Hash of a note's text, used to tell real edits from touches."""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def scan_notes(diary_folder: str, recursive: bool = False):
+    """
+    Yield (path, stat) for every markdown note, like glob("*.md") but reusing
+    the directory entry's stat. With recursive, subfolders are scanned too;
+    hidden folders such as .obsidian are always skipped.
+    """
+    folders = [diary_folder]
+    while folders:
+        with os.scandir(folders.pop()) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if recursive and entry.is_dir(follow_symlinks=False):
+                    folders.append(entry.path)
+                elif entry.name.endswith('.md') and entry.is_file():
+                    yield entry.path, entry.stat()
+
+def scan_changes(diary_folder: str, known: dict, recursive: bool = False, key=None) -> tuple[list[str], list[str]]:
+    """
+    Stat the folder and compare every note with what a store last recorded.
+    A note the store did not record again, e.g. because it failed to parse,
+    is reported again by the next scan.
+    
+    Args:
+        diary_folder (str): Path to the diary folder
+        known (dict): (size, mtime_ns) of every recorded note, by note key
+        recursive (bool): Include notes in subfolders
+        key (callable): Note key of a path; by default the path relative to diary_folder
+        
+    Returns:
+        tuple[list[str], list[str]]: Paths of new or modified notes, and keys
+            of recorded notes that no longer exist
+    """
+    key = key or (lambda path: os.path.relpath(path, diary_folder))
+    changed = []
+    seen = set()
+    for path, stat in scan_notes(diary_folder, recursive):
+        name = key(path)
+        seen.add(name)
+        if known.get(name) != (stat.st_size, stat.st_mtime_ns):
+            changed.append(path)
+    removed = [name for name in known if name not in seen]
+    return changed, removed
+
+class VaultManifest:
+    """Per-note size, mtime_ns and content hash, persisted as JSON."""
+
+    def __init__(self, path: str, root: str = None):
+        """
+        Args:
+            path (str): Path of the manifest file
+            root (str): Vault folder; notes are keyed by their path relative
+                to it, or by file name when no root is given
+        """
+        self.path = path
+        self.root = root
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                # A damaged manifest only costs one full run
+                self.entries = {}
+
+    @classmethod
+    def for_vault(cls, diary_folder: str, filename: str = MANIFEST_FILENAME) -> "VaultManifest":
+        """
+        Open a manifest stored in the vault's hidden folder. Every consumer that
+        records its own progress (e.g. the crewAI processor) needs its own filename.
+        """
+        return cls(state_path(diary_folder, filename), diary_folder)
+
+    def _key(self, path: str) -> str:
+        # For top-level notes both keys are the file name, so older manifests stay valid
+        return os.path.relpath(path, self.root) if self.root else os.path.basename(path)
+
+    def changed_files(self, diary_folder: str, recursive: bool = False) -> list[str]:
+        """
+        Stat the folder and return the notes whose size or mtime differ from
+        the manifest. Notes that disappeared are dropped from the manifest.
+        
+        Args:
+            diary_folder (str): Path to the diary folder
+            recursive (bool): Include notes in subfolders
+            
+        Returns:
+            list[str]: Paths of new or modified notes
+        """
+        known = {name: (entry['size'], entry['mtime_ns']) for name, entry in self.entries.items()}
+        changed, removed = scan_changes(diary_folder, known, recursive, self._key)
+        for name in removed:
+            del self.entries[name]
+        return changed
+
+    def is_unchanged(self, path: str, content: str) -> bool:
+        """True if content hashes to what was recorded, i.e. the note was only touched."""
+        entry = self.entries.get(self._key(path))
+        return entry is not None and entry['hash'] == content_hash(content)
+
+    def record(self, path: str, digest: str):
+        """Remember the note's current size and mtime together with its content hash."""
+        stat = os.stat(path)
+        self.entries[self._key(path)] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'hash': digest,
+        }
+
+    def forget(self, path: str):
+        """Drop a note so the next run reads it again."""
+        self.entries.pop(self._key(path), None)
+
+    def save(self):
+        """Write the manifest atomically."""
+        atomic_write_text(self.path, json.dumps(self.entries, ensure_ascii=False, separators=(',', ':')))
@@ -0,0 +1,21 @@
+import os
+
+# Hidden folder inside the vault that holds caches and indexes. Obsidian
+# ignores dot-folders, so nothing here shows up as a note.
+STATE_DIR_NAME = ".obsidian_ai"
+
+def state_path(diary_folder: str, filename: str) -> str:
+    """
+    Return the path of a state file inside the vault's hidden folder,
+    creating the folder if needed.
+    
+    Args:
+        diary_folder (str): Path to the diary folder
+        filename (str): Name of the state file
+        
+    Returns:
+        str: Full path of the state file
+    """
+    state_dir = os.path.join(diary_folder, STATE_DIR_NAME)
+    os.makedirs(state_dir, exist_ok=True)
+    return os.path.join(state_dir, filename)
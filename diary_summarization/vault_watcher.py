@@ -0,0 +1,187 @@
+"""
+Watcher daemon that summarizes notes shortly after they are saved.
+
+File events come from watchdog (inotify, FSEvents, ReadDirectoryChangesW)
+when it is installed, and from a cheap stat poll of the folder otherwise.
+Obsidian autosaves every couple of seconds while typing, so a note is only
+summarized once it has not changed for `debounce` seconds. Settled notes go
+through update_diary_summaries, whose note locks keep the watcher and the
+Streamlit app from summarizing the same note twice. The watcher's own
+write-backs are recognized by their size and mtime and never re-queued.
+"""
+
+import os
+import threading
+import time
+
+from diary_summarization.diary_summary import update_diary_summaries
+from diary_summarization.vault_manifest import scan_notes
+
+DEFAULT_DEBOUNCE = 2.0
+DEFAULT_POLL_INTERVAL = 1.0
+
+def _signature(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+def _is_note(path: str) -> bool:
+    # Hidden files include the atomic writer's .name.XXXX.tmp files
+    return path.endswith('.md') and not os.path.basename(path).startswith('.')
+
+class VaultWatcher:
+    """Debounced, incremental summarization of notes as they are saved."""
+
+    def __init__(self, diary_folder: str, debounce: float = DEFAULT_DEBOUNCE,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, use_watchdog: bool = True,
+                 on_result=None, **update_options):
+        """
+        Args:
+            diary_folder (str): Path to the folder containing diary entries
+            debounce (float): Seconds a note must stay unchanged before it is summarized
+            poll_interval (float): Seconds between folder scans without watchdog
+            use_watchdog (bool): Use watchdog's native events when it is installed
+            on_result (callable): Called with (success, message) after every run
+            **update_options: Passed on to update_diary_summaries
+        """
+        self.diary_folder = os.path.abspath(diary_folder)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_watchdog = use_watchdog
+        self.on_result = on_result
+        self.update_options = update_options
+        self._condition = threading.Condition()
+        self._pending = {}  # path -> (signature, settle time)
+        self._processed = {}  # path -> signature right after our run, including our write-back
+        self._stopped = threading.Event()
+        self._threads = []
+        self._observer = None
+
+    def notify(self, path: str):
+        """Record a change to path; called by the event source, from any thread."""
+        if not _is_note(path):
+            return
+        signature = _signature(path)
+        with self._condition:
+            if signature is None or self._processed.get(path) == signature:
+                return
+            self._pending[path] = (signature, time.monotonic() + self.debounce)
+            self._condition.notify()
+
+    def _take_settled(self) -> list[str]:
+        """Wait until at least one note has settled and return every settled note."""
+        with self._condition:
+            while not self._stopped.is_set():
+                now = time.monotonic()
+                settled = []
+                for path, (signature, deadline) in list(self._pending.items()):
+                    if deadline > now:
+                        continue
+                    current = _signature(path)
+                    if current != signature:
+                        # Written again without an event (or deleted): wait once more
+                        if current is None:
+                            del self._pending[path]
+                        else:
+                            self._pending[path] = (current, now + self.debounce)
+                        continue
+                    del self._pending[path]
+                    if self._processed.get(path) == current:
+                        # Our own write-back, seen while its run was still going
+                        continue
+                    settled.append(path)
+                if settled:
+                    return settled
+                deadlines = [deadline for _, deadline in self._pending.values()]
+                self._condition.wait(timeout=max(0.0, min(deadlines) - now) if deadlines else None)
+            return []
+
+    def _report(self, success: bool, message: str):
+        if self.on_result:
+            self.on_result(success, message)
+        else:
+            print(message)
+
+    def _process(self, paths: list[str]):
+        success, message = update_diary_summaries(self.diary_folder, diary_files=paths, **self.update_options)
+        with self._condition:
+            for path in paths:
+                # A note edited during the run has another signature and stays eligible
+                self._processed[path] = _signature(path)
+        self._report(success, message)
+
+    def _worker(self):
+        while not self._stopped.is_set():
+            paths = self._take_settled()
+            if paths:
+                try:
+                    self._process(paths)
+                except Exception as e:
+                    print(f"Error summarizing {', '.join(paths)}: {str(e)}")
+
+    def _poll(self):
+        snapshot = {path: (stat.st_size, stat.st_mtime_ns) for path, stat in scan_notes(self.diary_folder)}
+        while not self._stopped.wait(self.poll_interval):
+            current = {path: (stat.st_size, stat.st_mtime_ns) for path, stat in scan_notes(self.diary_folder)}
+            for path, signature in current.items():
+                if snapshot.get(path) != signature:
+                    self.notify(path)
+            snapshot = current
+
+    def _start_watchdog(self) -> bool:
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory or event.event_type not in ('created', 'modified', 'moved'):
+                    return
+                # Atomic saves (ours and some editors') arrive as a move onto the note
+                watcher.notify(getattr(event, 'dest_path', None) or event.src_path)
+
+        self._observer = Observer()
+        self._observer.schedule(Handler(), self.diary_folder, recursive=False)
+        self._observer.start()
+        return True
+
+    def start(self, catch_up: bool = True):
+        """
+        Start watching in background threads.
+
+        Args:
+            catch_up (bool): First summarize notes changed while nothing was watching
+        """
+        if catch_up:
+            self._report(*update_diary_summaries(self.diary_folder, **self.update_options))
+        if not (self.use_watchdog and self._start_watchdog()):
+            self._threads.append(threading.Thread(target=self._poll, daemon=True))
+        self._threads.append(threading.Thread(target=self._worker, daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for thread in self._threads:
+            thread.join()
+
+    def run_forever(self):
+        """Watch until interrupted with Ctrl+C."""
+        self.start()
+        try:
+            while not self._stopped.wait(3600):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
@@ -0,0 +1,47 @@
+"""
+A batch answer is used only if it summarizes every diary exactly once.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+import json
+
+import pytest
+
+from diary_summarization import llm_backends
+from diary_summarization.llm_backends import FakeBackend
+from diary_summarization.ollama_functions import qwen2_batch_summary
+
+TEXTS = ["今天跑步。", "今天读书。", "今天下雨。"]
+
+def use_batch_reply(monkeypatch, items) -> list:
+    backend = FakeBackend()
+    prompts = []
+
+    def chat(prompt, **kwargs):
+        prompts.append(prompt)
+        if kwargs.get('format') is not None:
+            return {'content': json.dumps({'summaries': items}, ensure_ascii=False)}
+        return FakeBackend.chat(backend, prompt, **kwargs)
+
+    backend.chat = chat
+    monkeypatch.setattr(llm_backends, '_backend', backend)
+    return prompts
+
+def test_complete_batch_is_used(monkeypatch):
+    prompts = use_batch_reply(monkeypatch, [{'id': 2, 'summary': 'c'}, {'id': 0, 'summary': 'a'},
+                                            {'id': 1, 'summary': 'b'}])
+    assert qwen2_batch_summary(TEXTS) == ['a', 'b', 'c']
+    assert len(prompts) == 1
+
+@pytest.mark.parametrize('items', [
+    [{'id': 0, 'summary': 'a'}, {'id': 1, 'summary': 'b'}],                               # one missing
+    [{'id': 0, 'summary': 'a'}, {'id': 1, 'summary': 'b'}, {'id': 1, 'summary': 'b2'}],   # duplicate
+    [{'id': 1, 'summary': 'a'}, {'id': 2, 'summary': 'b'}, {'id': 3, 'summary': 'c'}],    # renumbered
+    [{'id': 0, 'summary': 'a'}, {'id': 1, 'summary': ' '}, {'id': 2, 'summary': 'c'}],    # empty
+])
+def test_incomplete_batch_is_retried_one_by_one(monkeypatch, items):
+    prompts = use_batch_reply(monkeypatch, items)
+    assert qwen2_batch_summary(TEXTS) == [FakeBackend.REPLY] * len(TEXTS)
+    assert len(prompts) == 1 + len(TEXTS)
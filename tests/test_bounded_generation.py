@@ -0,0 +1,97 @@
+"""
+Limits, circuit breaker and reply trimming of bounded generation.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from diary_summarization import bounded_generation as bounded_generation_module
+from diary_summarization.bounded_generation import (
+    CircuitBreaker, bounded_generation, get_generation_limits, run_in_context, trim_reply,
+)
+
+def test_overlapping_runs_keep_their_own_limits():
+    # Run A enters, then B, then A exits, then B exits, each on its own thread
+    a_entered, b_entered, a_exited = threading.Event(), threading.Event(), threading.Event()
+    seen = {}
+
+    def run_a():
+        with bounded_generation(run_seconds=0.01):
+            a_entered.set()
+            b_entered.wait()
+        a_exited.set()
+
+    def run_b():
+        a_entered.wait()
+        with bounded_generation(run_seconds=60) as limits:
+            b_entered.set()
+            a_exited.wait()
+            seen['b'] = get_generation_limits() is limits
+        seen['after_b'] = get_generation_limits()
+
+    threads = [threading.Thread(target=run_a), threading.Thread(target=run_b)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen == {'b': True, 'after_b': None}
+    assert get_generation_limits() is None
+
+def test_worker_threads_see_the_run_limits():
+    with bounded_generation(request_timeout=5.0) as limits:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            wrapped = list(executor.map(run_in_context(lambda _: get_generation_limits()), range(4)))
+            plain = list(executor.map(lambda _: get_generation_limits(), range(4)))
+    assert all(seen is limits for seen in wrapped)
+    assert plain == [None] * 4
+    assert get_generation_limits() is None
+
+def use_clock(monkeypatch, start: float = 100.0) -> list:
+    now = [start]
+    monkeypatch.setattr(bounded_generation_module.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_breaker_opens_after_consecutive_failures(monkeypatch):
+    now = use_clock(monkeypatch)
+    breaker = CircuitBreaker(failures=3, cooldown=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # A success in between starts the count again
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow() and not breaker.is_open()
+    breaker.record_failure()
+    assert breaker.is_open() and not breaker.allow()
+
+    now[0] += 31
+    assert not breaker.is_open()
+    assert breaker.allow()      # One probe after the cool-down
+    assert not breaker.allow()  # and no other request while it runs
+
+def test_failed_probe_reopens_and_successful_probe_closes(monkeypatch):
+    now = use_clock(monkeypatch)
+    breaker = CircuitBreaker(failures=1, cooldown=30)
+    breaker.record_failure()
+    now[0] += 31
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open() and not breaker.allow()
+
+    now[0] += 31
+    assert breaker.allow()
+    breaker.record_success()
+    assert not breaker.is_open()
+    assert breaker.allow() and breaker.allow()
+
+def test_trim_reply_cuts_at_a_sentence_end():
+    # Only replies that reached max_chars are trimmed
+    assert trim_reply("今天跑步了。很开心。然后", 10) == "今天跑步了。很开心。"
+    assert trim_reply("One. Two. Three", 9) == "One. Two."
+
+def test_trim_reply_without_a_late_sentence_end_gets_an_ellipsis():
+    # The only sentence end would keep less than half of the reply
+    assert trim_reply("好。今天去公园跑步然后回家读书写字", 12) == "好。今天去公园跑步然后回…"
+    assert trim_reply("today I went running ", 21) == "today I went running…"
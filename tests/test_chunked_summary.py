@@ -0,0 +1,49 @@
+"""
+Long diaries are chunked by section, never across or inside section content.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+from diary_summarization import llm_backends
+from diary_summarization.chunked_summary import split_into_chunks, summarize_long_text
+from diary_summarization.llm_backends import FakeBackend
+from diary_summarization.md_helper_functions import get_non_empty_sections
+
+DIARY = ("# 🙏 praying\n感恩今天的阳光; 我想; 再说\n"
+         "# 📖 reading\n读了两章书。\n")
+
+def test_separator_inside_a_section_stays_in_its_chunk():
+    sections = get_non_empty_sections(DIARY)
+    assert split_into_chunks(sections, token_budget=50) == [
+        "praying: 感恩今天的阳光; 我想; 再说",
+        "reading: 读了两章书。",
+    ]
+
+def test_split_pieces_keep_their_header():
+    long_body = "。".join(["今天写了很多内容"] * 40) + "。"
+    chunks = split_into_chunks([("praying", long_body), ("reading", "读书; 写字")], token_budget=60)
+    assert len(chunks) > 2
+    assert all(chunk.startswith("praying: ") for chunk in chunks[:-1])
+    assert chunks[-1] == "reading: 读书; 写字"
+
+def test_editing_one_section_keeps_the_other_chunks():
+    before = split_into_chunks([("praying", "感恩; 我想"), ("reading", "读书")], token_budget=50)
+    after = split_into_chunks([("praying", "感恩; 我想; 再说"), ("reading", "读书")], token_budget=50)
+    assert before[1] == after[1]
+    assert before[0] != after[0]
+
+def test_one_request_per_section(monkeypatch):
+    backend = FakeBackend()
+    prompts = []
+
+    def chat(prompt, **kwargs):
+        prompts.append(prompt)
+        return FakeBackend.chat(backend, prompt, **kwargs)
+
+    backend.chat = chat
+    monkeypatch.setattr(llm_backends, '_backend', backend)
+    summary = summarize_long_text(get_non_empty_sections(DIARY), token_budget=50)
+    assert summary
+    # Two chunk summaries and one merge
+    assert len(prompts) == 3
@@ -0,0 +1,45 @@
+"""
+Posting list encoding and BM25 ranking of the full-text index.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+from diary_summarization.fulltext_index import FullTextIndex, decode_postings, encode_postings, tokenize
+
+def test_postings_round_trip():
+    postings = [(1, 1), (2, 3), (130, 1), (20000, 200), (3_000_000, 1)]
+    data = encode_postings(postings)
+    assert list(decode_postings(data)) == postings
+    # Deltas under 128 take one byte each
+    assert len(encode_postings([(1, 1), (2, 1), (3, 1)])) == 6
+
+def test_appended_postings_continue_from_the_last_id():
+    first = [(5, 2), (9, 1)]
+    second = [(300, 4), (301, 1)]
+    data = encode_postings(first) + encode_postings(second, last_id=9)
+    assert list(decode_postings(data)) == first + second
+
+def test_tokenize_mixes_words_and_cjk_bigrams():
+    assert tokenize("Running 跑步很开心, 好") == ['running', '跑步', '步很', '很开', '开心', '好']
+
+def test_search_ranks_by_bm25(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "a.md").write_text("# 运动\n跑步 跑步 跑步，然后读书。\n", encoding='utf-8')
+    (vault / "b.md").write_text("# 运动\n早上跑步，下午写代码，晚上做饭、洗衣服、看电影。\n", encoding='utf-8')
+    (vault / "c.md").write_text("# 阅读\n读书一小时。\n", encoding='utf-8')
+    with FullTextIndex(str(tmp_path / "index.sqlite")) as index:
+        assert index.update(str(vault)) == {'indexed': 3, 'removed': 0, 'sections': 3}
+        hits = index.search("跑步", k=10)
+        assert [hit['note'] for hit in hits] == ['a.md', 'b.md']
+        assert hits[0]['score'] > hits[1]['score'] > 0
+        assert hits[0]['header'] == "运动"
+        assert "**跑步**" in hits[0]['snippet']
+        assert index.search("游泳") == []
+
+        # An edited note is re-indexed and its old postings no longer match
+        (vault / "a.md").write_text("# 运动\n今天游泳。\n", encoding='utf-8')
+        assert index.update(str(vault))['indexed'] == 1
+        assert [hit['note'] for hit in index.search("跑步")] == ['b.md']
+        assert [hit['note'] for hit in index.search("游泳")] == ['a.md']
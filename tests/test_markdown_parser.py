@@ -0,0 +1,80 @@
+"""
+Parity of the single-pass parser with the regex cascade it replaced.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+import os
+
+import pytest
+
+from diary_summarization.markdown_parser import parse_diary
+from diary_summarization.md_helper_functions import (
+    clean_content, extract_header_content, extract_span_content, extract_yaml_frontmatter,
+    parse_markdown_template,
+)
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'diary_summarization', 'diary')
+SAMPLES = ['diary1.md', 'diary2.md', 'td.md']
+
+def legacy_parse(md_content):
+    """What parse_markdown_template returned before the single-pass parser."""
+    md_content = clean_content(md_content.replace('\r\n', '\n'))
+    return {
+        'frontmatter': extract_yaml_frontmatter(md_content),
+        'span_data': extract_span_content(md_content),
+        'headers': extract_header_content(md_content),
+    }
+
+def read_sample(name):
+    with open(os.path.join(SAMPLES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_samples_match_legacy(name):
+    content = read_sample(name)
+    assert parse_markdown_template(content) == legacy_parse(content)
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_crlf_samples_match_legacy(name):
+    content = read_sample(name).replace('\n', '\r\n')
+    assert parse_markdown_template(content) == legacy_parse(content)
+
+def test_crlf_section_offsets_are_exact():
+    content = "---\r\na: 1\r\n---\r\n<span data-date='x'>\r\nhi\r\n</span>\r\n# A\r\nhello\r\n# B\r\nworld\r\n"
+    raw = content.encode('utf-8')
+    sections = parse_diary(content).sections
+    assert [raw[s.start:s.end] for s in sections] == [b"# A\r\nhello\r\n", b"# B\r\nworld\r\n"]
+
+def test_lf_section_offsets_are_exact():
+    content = "<span data-date='x'>好</span>\n# 挑战\n跑步\n# B\nworld"
+    raw = content.encode('utf-8')
+    sections = parse_diary(content).sections
+    assert [raw[s.start:s.end] for s in sections] == ["# 挑战\n跑步\n".encode('utf-8'), b"# B\nworld"]
+
+def test_unterminated_span_keeps_sections():
+    content = "---\na: 1\n---\n<span data-date='x'>\n\n# A\nhello\n# B\nworld\n"
+    doc = parse_diary(content)
+    assert doc.headers() == {'A': 'hello', 'B': 'world'}
+    assert parse_markdown_template(content) == legacy_parse(content)
+
+def test_unterminated_span_at_end_of_file():
+    content = "# A\nhello\n<span data-date='x'>\nstill typing"
+    assert parse_markdown_template(content) == legacy_parse(content)
+
+def test_multiline_span():
+    doc = parse_diary("<span\n  data-date='2024-03-01'\n  data-title='日记'>\n  今天很好\n</span>\n# A\nx\n")
+    assert doc.span_data == {'date': '2024-03-01', 'title': '日记'}
+    assert doc.span_body == '今天很好'
+    assert doc.headers() == {'A': 'x'}
+
+def test_hash_inside_text_is_content():
+    # The regex cascade cut sections at any '#', turning "C# here" into a
+    # header; the parser only treats "# " at the start of a line as a header
+    content = "# A\nI use #hashtags and C# here\n# B\nworld\n"
+    assert parse_diary(content).headers() == {'A': 'I use #hashtags and C# here', 'B': 'world'}
+
+def test_headers_in_code_fences_are_content():
+    content = "# A\n```\n# not a header\n```\n# B\nworld\n"
+    assert parse_diary(content).headers() == {'A': '```\n# not a header\n```', 'B': 'world'}
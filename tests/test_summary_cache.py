@@ -0,0 +1,58 @@
+"""
+Summary cache keys and eviction.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+from diary_summarization import summary_cache
+from diary_summarization.summary_cache import SummaryCache, make_cache_key
+
+OPTIONS = {'temperature': 0.2, 'num_ctx': 4096}
+
+def test_key_covers_everything_that_shapes_the_summary():
+    key = make_cache_key("今天跑步。", "qwen2", 1, OPTIONS)
+    assert key == make_cache_key("今天跑步。", "qwen2", 1, dict(reversed(list(OPTIONS.items()))))
+    assert len({
+        key,
+        make_cache_key("今天读书。", "qwen2", 1, OPTIONS),
+        make_cache_key("今天跑步。", "qwen2.5", 1, OPTIONS),
+        make_cache_key("今天跑步。", "qwen2", 2, OPTIONS),
+        make_cache_key("今天跑步。", "qwen2", 1, {**OPTIONS, 'temperature': 0.7}),
+    }) == 5
+
+def use_clock(monkeypatch, start: float = 1_000_000.0) -> list:
+    now = [start]
+    monkeypatch.setattr(summary_cache.time, 'time', lambda: now[0])
+    return now
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    now = use_clock(monkeypatch)
+    with SummaryCache(str(tmp_path / "cache.sqlite"), max_entries=2) as cache:
+        for key in ('a', 'b', 'c'):
+            cache.put(key, key.upper())
+            now[0] += 1
+        assert cache.get('a') == 'A'  # Used again, so 'b' is now the oldest
+        now[0] += 1
+        assert cache.evict() == 1
+        assert cache.get('b') is None
+        assert (cache.get('a'), cache.get('c')) == ('A', 'C')
+        assert cache.stats() == {'hits': 3, 'misses': 1, 'entries': 2}
+
+def test_entries_unused_for_too_long_are_evicted(tmp_path, monkeypatch):
+    now = use_clock(monkeypatch)
+    with SummaryCache(str(tmp_path / "cache.sqlite"), max_age_days=1) as cache:
+        cache.put('old', 'OLD')
+        now[0] += 86400 / 2
+        cache.put('new', 'NEW')
+        now[0] += 86400 / 2 + 1
+        assert cache.evict() == 1
+        assert cache.get('old') is None
+        assert cache.get('new') == 'NEW'
+
+def test_cache_persists_across_opens(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    with SummaryCache(path) as cache:
+        cache.put('key', '总结')
+    with SummaryCache(path) as cache:
+        assert cache.get('key') == '总结'
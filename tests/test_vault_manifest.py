@@ -0,0 +1,71 @@
+"""
+Change detection: a run only opens notes that are new or were modified.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+import os
+
+from diary_summarization.vault_manifest import VaultManifest, content_hash, scan_changes
+
+def write_note(path, content: str, mtime_ns: int = None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def record_all(manifest: VaultManifest, folder, recursive: bool = False):
+    for path in manifest.changed_files(str(folder), recursive):
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest.record(path, content_hash(f.read()))
+
+def test_only_new_and_modified_notes_are_changed(tmp_path):
+    vault = tmp_path / "vault"
+    write_note(vault / "a.md", "A", 1_000_000_000)
+    write_note(vault / "b.md", "B", 1_000_000_000)
+    write_note(vault / ".obsidian" / "hidden.md", "H")
+    write_note(vault / "notes.txt", "not a note")
+    manifest = VaultManifest.for_vault(str(vault))
+    assert sorted(os.path.basename(p) for p in manifest.changed_files(str(vault))) == ['a.md', 'b.md']
+    record_all(manifest, vault)
+    manifest.save()
+
+    manifest = VaultManifest.for_vault(str(vault))
+    assert manifest.changed_files(str(vault)) == []
+    write_note(vault / "a.md", "A edited", 2_000_000_000)  # Size and mtime change
+    write_note(vault / "b.md", "b", 3_000_000_000)         # Same size, new mtime
+    write_note(vault / "c.md", "C")
+    assert sorted(os.path.basename(p) for p in manifest.changed_files(str(vault))) == ['a.md', 'b.md', 'c.md']
+
+def test_touched_note_is_unchanged_by_content(tmp_path):
+    vault = tmp_path / "vault"
+    write_note(vault / "a.md", "A", 1_000_000_000)
+    manifest = VaultManifest.for_vault(str(vault))
+    record_all(manifest, vault)
+    os.utime(vault / "a.md", ns=(2_000_000_000, 2_000_000_000))
+    assert manifest.changed_files(str(vault)) == [str(vault / "a.md")]
+    assert manifest.is_unchanged(str(vault / "a.md"), "A")
+    assert not manifest.is_unchanged(str(vault / "a.md"), "A edited")
+
+def test_deleted_notes_are_dropped(tmp_path):
+    vault = tmp_path / "vault"
+    write_note(vault / "a.md", "A")
+    write_note(vault / "sub" / "b.md", "B")
+    manifest = VaultManifest.for_vault(str(vault))
+    record_all(manifest, vault, recursive=True)
+    assert set(manifest.entries) == {"a.md", os.path.join("sub", "b.md")}
+    (vault / "sub" / "b.md").unlink()
+    assert manifest.changed_files(str(vault), recursive=True) == []
+    assert set(manifest.entries) == {"a.md"}
+
+def test_scan_changes_keys(tmp_path):
+    write_note(tmp_path / "a.md", "A", 1_000_000_000)
+    write_note(tmp_path / "sub" / "b.md", "B", 1_000_000_000)
+    known = {"a.md": (1, 1_000_000_000), "gone.md": (1, 1_000_000_000)}
+    changed, removed = scan_changes(str(tmp_path), known, recursive=True)
+    assert changed == [str(tmp_path / "sub" / "b.md")]
+    assert removed == ["gone.md"]
+    changed, removed = scan_changes(str(tmp_path), {"b.md": (1, 1_000_000_000)}, recursive=True,
+                                    key=os.path.basename)
+    assert (changed, removed) == ([str(tmp_path / "a.md")], [])
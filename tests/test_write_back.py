@@ -0,0 +1,94 @@
+"""
+Writing summaries back must never overwrite an edit made while the model ran,
+nor leave a note half-written.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+import os
+
+import pytest
+
+from diary_summarization import atomic_write, llm_backends
+from diary_summarization.atomic_write import atomic_write_text
+from diary_summarization.diary_summary import stamp_has_summary, update_diary_summaries
+from diary_summarization.llm_backends import FakeBackend
+
+NOTE = ("---\ntags:\n  - diary\n---\n"
+        "<span class='ob-timelines' data-date='2024-03-01' data-title='日记'></span>\n"
+        "# 😊 Daily Summary：\n今天去跑步了，感觉很好。\n")
+
+def use_backend(monkeypatch, chat=None) -> FakeBackend:
+    backend = FakeBackend()
+    if chat is not None:
+        backend.chat = chat
+    monkeypatch.setattr(llm_backends, '_backend', backend)
+    return backend
+
+def test_edit_during_summary_is_kept(tmp_path, monkeypatch):
+    note = tmp_path / "2024-03-01.md"
+    note.write_text(NOTE, encoding='utf-8')
+
+    def chat_while_editing(prompt, **kwargs):
+        # The user keeps typing while the model runs
+        with open(note, 'a', encoding='utf-8') as f:
+            f.write("晚上又写了一段。\n")
+        return FakeBackend.chat(backend, prompt, **kwargs)
+
+    backend = use_backend(monkeypatch, chat_while_editing)
+    success, message = update_diary_summaries(str(tmp_path), template_path=None, use_cache=False)
+    assert success, message
+    content = note.read_text(encoding='utf-8')
+    assert content.endswith("晚上又写了一段。\n")
+    assert FakeBackend.REPLY not in content
+
+    # Deferred, so the next run summarizes the edited note
+    use_backend(monkeypatch)
+    success, message = update_diary_summaries(str(tmp_path), template_path=None, use_cache=False)
+    assert success, message
+    content = note.read_text(encoding='utf-8')
+    assert FakeBackend.REPLY in content
+    assert "晚上又写了一段。" in content
+
+def test_unedited_note_is_written(tmp_path, monkeypatch):
+    note = tmp_path / "2024-03-01.md"
+    note.write_text(NOTE, encoding='utf-8')
+    use_backend(monkeypatch)
+    success, message = update_diary_summaries(str(tmp_path), template_path=None, use_cache=False, batch_size=4)
+    assert success, message
+    content = note.read_text(encoding='utf-8')
+    assert FakeBackend.REPLY in content
+    assert "has_summary: true" in content
+
+def test_stamp_has_summary():
+    assert stamp_has_summary("# 日记\n") == "---\nhas_summary: true\n---\n# 日记\n"
+    assert stamp_has_summary("---\ntags: diary\n---\n# 日记\n") == \
+        "---\ntags: diary\nhas_summary: true\n---\n# 日记\n"
+    assert stamp_has_summary("---\nhas_summary: false\nmood: 3\n---\nx") == \
+        "---\nhas_summary: true\nmood: 3\n---\nx"
+    # Windows line endings are kept
+    assert stamp_has_summary("---\r\ntags: diary\r\n---\r\nx") == \
+        "---\r\ntags: diary\r\nhas_summary: true\r\n---\r\nx"
+
+def test_atomic_write_keeps_permissions_and_leaves_no_temp_file(tmp_path):
+    note = tmp_path / "2024-03-01.md"
+    note.write_text("old", encoding='utf-8')
+    os.chmod(note, 0o640)
+    atomic_write_text(str(note), "新的内容")
+    assert note.read_text(encoding='utf-8') == "新的内容"
+    assert os.stat(note).st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ["2024-03-01.md"]
+
+def test_failed_atomic_write_leaves_the_old_note(tmp_path, monkeypatch):
+    note = tmp_path / "2024-03-01.md"
+    note.write_text("old", encoding='utf-8')
+
+    def crash(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(atomic_write.os, 'replace', crash)
+    with pytest.raises(OSError):
+        atomic_write_text(str(note), "new")
+    assert note.read_text(encoding='utf-8') == "old"
+    assert os.listdir(tmp_path) == ["2024-03-01.md"]